@@ -24,7 +24,9 @@ def main():
               help='Output directory for knowledge base')
 @click.option('--name', '-n', default='kb',
               help='Knowledge base name (default: kb)')
-def generate(folder, output, name):
+@click.option('--no-dedup', is_flag=True,
+              help='Pack files with identical content in every folder that contains them')
+def generate(folder, output, name, no_dedup):
     """Generate knowledge base from code folders"""
     if not folder:
         click.echo("Error: No folders specified. Use --folder to add folders.")
@@ -34,38 +36,144 @@ def generate(folder, output, name):
     
     import subprocess
     import os
+    import shutil
+    try:
+        from docs_mcp.kb import pack_folders, create_staging_dir, swap_into_place, get_kb_dir
+        from docs_mcp.dedup import plan_dedup
+    except ImportError:
+        from kb import pack_folders, create_staging_dir, swap_into_place, get_kb_dir
+        from dedup import plan_dedup
     
     # Calculate output path
-    out_dir = Path(output) if output else Path.home() / ".docs-mcp" / "kbs" / name
+    out_dir = Path(output) if output else get_kb_dir(name)
     
-    # Clear existing files in the KB directory
-    import shutil
-    if out_dir.exists():
-        shutil.rmtree(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    folders = [os.path.abspath(str(f)) for f in folder]
+    plan = None
+    if not no_dedup:
+        plan = plan_dedup(folders)
+        click.echo(f"Skipping {plan.duplicate_count} duplicate file(s)")
     
-    # Use UTF-8 environment for Windows
-    env = os.environ.copy()
-    env["PYTHONUTF8"] = "1"
+    def run(f_path, cmd, env):
+        skipped = len(plan.ignored.get(f_path, ())) if plan else 0
+        click.echo(f"Running repomix for {f_path} ({skipped} duplicate(s) skipped)")
+        subprocess.run(cmd, check=True, env=env)
+    
+    # Build into a staging directory so the existing KB keeps serving until
+    # the new one is complete
+    staging_dir = create_staging_dir(out_dir)
     
     try:
-        for f in folder:
-            f_path = str(f)
-            f_name = os.path.basename(f_path)
-            out_file = out_dir / f"{f_name}.md"
+        outputs = pack_folders(folders, staging_dir, plan, run=run)
+        for f_path in folders:
+            if f_path not in outputs:
+                click.echo(f"Skipped {f_path}: all of its files are packed from other folders")
+        # Files dropped from the KB are kept for a grace period, as readers
+        # may still have them open; the next build past it deletes them
+        swap_into_place(staging_dir, out_dir)
             
-            cmd = ["uvx", "repomix", "--output", str(out_file), f_path]
-            click.echo(f"Running command: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True, env=env)
-            
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         click.echo(f"Error generating KB: {e}")
         sys.exit(1)
+    finally:
+        # Only left behind if the build failed
+        shutil.rmtree(staging_dir, ignore_errors=True)
     
     click.echo("✅ Knowledge base generated successfully!")
     click.echo(f"Output: {output or 'default location'}")
 
 
+@main.command()
+@click.option('--folder', '-f', multiple=True, type=click.Path(exists=True, file_okay=False),
+              help='Folder to watch (can be specified multiple times)')
+@click.option('--output', '-o', type=click.Path(),
+              help='Output directory for knowledge base')
+@click.option('--name', '-n', default='kb',
+              help='Knowledge base name (default: kb)')
+@click.option('--debounce', '-d', default=2.0, type=float,
+              help='Seconds of quiet before re-packing a changed folder (default: 2)')
+@click.option('--poll', is_flag=True,
+              help='Poll for changes instead of using native file events')
+@click.option('--interval', default=1.0, type=float,
+              help='Seconds between polls (default: 1)')
+@click.option('--no-dedup', is_flag=True,
+              help='Pack files with identical content in every folder that contains them')
+def watch(folder, output, name, debounce, poll, interval, no_dedup):
+    """Keep a knowledge base up to date as its folders change"""
+    if not folder:
+        click.echo("Error: No folders specified. Use --folder to add folders.")
+        sys.exit(1)
+    
+    try:
+        from docs_mcp.watch import KBWatcher, WATCHDOG_AVAILABLE
+        from docs_mcp.kb import get_kb_dir
+    except ImportError:
+        from watch import KBWatcher, WATCHDOG_AVAILABLE
+        from kb import get_kb_dir
+    
+    out_dir = Path(output) if output else get_kb_dir(name)
+    
+    def on_update(folders):
+        for f in folders:
+            click.echo(f"✓ Re-packed {f}")
+    
+    watcher = KBWatcher(folder, out_dir, debounce=debounce, dedup=not no_dedup,
+                        poll=poll, interval=interval, on_update=on_update)
+    try:
+        watcher.start()
+        click.echo(f"Watching {len(folder)} folder(s) for '{name}' ({watcher.mode} mode)")
+        click.echo(f"Output: {out_dir}")
+        if not WATCHDOG_AVAILABLE:
+            click.echo("For native file events install with: pip install docs-mcp[watch]")
+        click.echo("Press Ctrl+C to stop")
+        watcher.run_forever()
+    except KeyboardInterrupt:
+        click.echo("\nWatch stopped.")
+    except Exception as e:
+        click.echo(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        watcher.stop()
+
+
+@main.command()
+@click.argument('folders', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option('--top', '-t', default=10, type=int,
+              help='Number of largest files and directories to list (default: 10)')
+@click.option('--workers', '-w', type=int, default=None,
+              help='Threads used to walk each folder (default: CPU count)')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Print results as JSON')
+def scan(folders, top, workers, as_json):
+    """Estimate knowledge base size for folders before generating"""
+    try:
+        from docs_mcp.scan import scan_folder, format_bytes
+    except ImportError:
+        from scan import scan_folder, format_bytes
+    
+    results = [scan_folder(f, top=top, workers=workers) for f in folders]
+    
+    if as_json:
+        import json
+        click.echo(json.dumps(results, indent=2))
+        return
+    
+    for r in results:
+        click.echo(f"\n📁 {r['path']}")
+        click.echo(f"  Files:            {r['file_count']}")
+        click.echo(f"  Size:             {format_bytes(r['total_bytes'])}")
+        click.echo(f"  Estimated tokens: {r['estimated_tokens']:,}")
+        click.echo(f"  Excluded:         {r['excluded_files']} file(s), "
+                   f"{format_bytes(r['excluded_bytes'])} by ignore rules")
+        if r['largest_dirs']:
+            click.echo("  Largest directories:")
+            for d in r['largest_dirs']:
+                click.echo(f"    {format_bytes(d['bytes']):>10}  {d['path']}/")
+        if r['largest_files']:
+            click.echo("  Largest files:")
+            for f in r['largest_files']:
+                click.echo(f"    {format_bytes(f['bytes']):>10}  {f['path']}")
+
+
 @main.command()
 @click.option('--port', '-p', default=5000, type=int,
               help='Port to run web server on (default: 5000)')
@@ -73,7 +181,9 @@ def generate(folder, output, name):
               help='Host to bind to (default: 127.0.0.1)')
 @click.option('--no-browser', is_flag=True,
               help='Do not open browser automatically')
-def web(port, host, no_browser):
+@click.option('--index-workers', type=int, default=None,
+              help='Processes used to build the search index (default: CPU count)')
+def web(port, host, no_browser, index_workers):
     """Start web UI for managing knowledge bases"""
     try:
         try:
@@ -86,7 +196,8 @@ def web(port, host, no_browser):
         sys.exit(1)
     
     try:
-        start_web_server(port=port, host=host, open_browser=not no_browser)
+        start_web_server(port=port, host=host, open_browser=not no_browser,
+                         index_workers=index_workers)
     except KeyboardInterrupt:
         click.echo("\nServer stopped.")
     except Exception as e:
@@ -133,6 +244,138 @@ def serve(kb_path, port):
     """)
 
 
+@main.command()
+@click.argument('kb')
+@click.argument('query', required=False)
+@click.option('--top-k', '-k', default=5, type=int,
+              help='Number of results per query (default: 5)')
+@click.option('--workers', '-w', type=int, default=None,
+              help='Processes used if the index needs building (default: CPU count)')
+@click.option('--no-snippets', is_flag=True,
+              help='Omit snippet text from results')
+@click.option('--batch-size', '-b', default=1, type=int,
+              help='Score stdin queries in batches of this size (default: 1)')
+def search(kb, query, top_k, workers, no_snippets, batch_size):
+    """Search a knowledge base, printing one JSON line per query
+
+    KB is a knowledge base name or directory. Without QUERY, or with '-',
+    queries are read from stdin, one per line.
+    """
+    import json
+    import time
+    import itertools
+    try:
+        from docs_mcp.index import SearchIndex
+        from docs_mcp.kb import get_kb_dir
+    except ImportError:
+        from index import SearchIndex
+        from kb import get_kb_dir
+    
+    kb_path = Path(kb)
+    if not kb_path.is_dir():
+        kb_path = get_kb_dir(kb)
+    if not kb_path.is_dir():
+        click.echo(f"Error: Knowledge base not found: {kb}", err=True)
+        sys.exit(1)
+    
+    started = time.perf_counter()
+    index = SearchIndex.load(kb_path, workers=workers)
+    click.echo(f"Loaded {len(index)} chunks from {kb_path} in "
+               f"{(time.perf_counter() - started) * 1000:.1f} ms", err=True)
+    
+    queries = [query] if query and query != '-' else (line.strip() for line in sys.stdin)
+    queries = (q for q in queries if q)
+    
+    def emit(q, results, took_ms, batched=None):
+        record = {
+            'query': q,
+            'took_ms': round(took_ms, 3),
+            'results': [
+                {
+                    'file': str(s.file_path) if s.file_path else "",
+                    'score': float(s.match_score),
+                    'header': str(s.header_path) if s.header_path else "Root",
+                    'kb_files': kb_files,
+                    'sources': sources,
+                    **({} if no_snippets else {'snippet': s.snippet})
+                }
+                for s, kb_files, sources in results
+            ]
+        }
+        if batched:
+            record['batched'] = batched
+        click.echo(json.dumps(record, ensure_ascii=False))
+    
+    if batch_size <= 1:
+        for q in queries:
+            started = time.perf_counter()
+            results = index.search(q, top_k=top_k)
+            emit(q, results, (time.perf_counter() - started) * 1000)
+        return
+    
+    # Score queries in batches; took_ms is each query's share of its batch
+    batch = []
+    for q in itertools.chain(queries, [None]):
+        if q is not None:
+            batch.append(q)
+        if batch and (q is None or len(batch) == batch_size):
+            started = time.perf_counter()
+            batch_results = index.search_batch(batch, top_k=top_k)
+            took_ms = (time.perf_counter() - started) * 1000 / len(batch)
+            for bq, results in zip(batch, batch_results):
+                emit(bq, results, took_ms, batched=len(batch))
+            batch = []
+
+
+@main.command()
+@click.option('--url', default=None,
+              help='Base URL of a running web UI (default: start one on a synthetic KB)')
+@click.option('--concurrency', '-c', default=8, type=int,
+              help='Concurrent clients (default: 8)')
+@click.option('--duration', '-d', default=10.0, type=float,
+              help='Seconds to run for (default: 10)')
+@click.option('--requests', '-r', 'total_requests', default=None, type=int,
+              help='Stop after this many requests instead of after --duration')
+@click.option('--mix', '-m', default='search=6,kbs=2,kb_status=1,server_status=1',
+              help='Endpoint weights (default: search=6,kbs=2,kb_status=1,server_status=1)')
+@click.option('--files', default=20, type=int,
+              help='Files in the synthetic KB (default: 20)')
+@click.option('--sections', default=200, type=int,
+              help='Code sections per synthetic file (default: 200)')
+@click.option('--json', 'as_json', is_flag=True,
+              help='Print the report as JSON')
+def loadtest(url, concurrency, duration, total_requests, mix, files, sections, as_json):
+    """Load test the web UI API and report latency percentiles"""
+    try:
+        from docs_mcp.loadtest import run_load, run_local, parse_mix, format_report
+    except ImportError:
+        from loadtest import run_load, run_local, parse_mix, format_report
+    
+    try:
+        weights = parse_mix(mix)
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+        sys.exit(1)
+    
+    options = dict(concurrency=concurrency, duration=duration,
+                   requests=total_requests, mix=weights)
+    try:
+        if url:
+            report = run_load(url.rstrip('/'), **options)
+        else:
+            report = run_local(files=files, sections=sections, **options)
+    except ImportError:
+        click.echo("Error: Web UI dependencies not installed.")
+        click.echo("Install with: pip install docs-mcp[web]")
+        sys.exit(1)
+    
+    if as_json:
+        import json
+        click.echo(json.dumps(report, indent=2))
+    else:
+        click.echo(format_report(report))
+
+
 @main.command()
 @click.argument('kb_name')
 def remove(kb_name):
@@ -140,6 +383,10 @@ def remove(kb_name):
     import os
     import shutil
     import subprocess
+    try:
+        from docs_mcp.kb import get_kb_dir
+    except ImportError:
+        from kb import get_kb_dir
     
     click.echo(f"Removing knowledge base: {kb_name}")
     
@@ -154,7 +401,7 @@ def remove(kb_name):
         click.echo(f"Failed to remove Claude Desktop config: {e}", err=True)
         
     # Remove directory
-    kb_path = Path.home() / ".docs-mcp" / "kbs" / kb_name
+    kb_path = get_kb_dir(kb_name)
     if kb_path.exists():
         try:
             shutil.rmtree(kb_path)
@@ -0,0 +1,339 @@
+"""
+docs-mcp content-addressed deduplication
+
+Finds files with identical content across the selected folders so each
+unique file body is packed into the knowledge base once. A manifest in the
+KB directory records every location of the deduplicated files, letting
+search collapse duplicate hits into one result.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import Counter, defaultdict
+from pathlib import Path
+
+try:
+    from docs_mcp.files import walk_files
+except ImportError:
+    from files import walk_files
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "dedup.json"
+
+# Characters repomix would interpret in an ignore pattern
+_GLOB_CHARS = set('*?[]{}!\\')
+
+# Bytes repomix checks when deciding a file is binary and skipping it
+_BINARY_CHECK_BYTES = 1024
+_TEXT_CHARS = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7F})
+
+
+def hash_file(path, block_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _is_binary(path):
+    """Whether repomix would skip a file as binary"""
+    with open(path, 'rb') as f:
+        return bool(f.read(_BINARY_CHECK_BYTES).translate(None, _TEXT_CHARS))
+
+
+class DedupPlan:
+    """Which files to skip when packing each folder, and where duplicates live"""
+
+    def __init__(self):
+        self.ignored = defaultdict(list)  # {folder: [relative_path, ...]}
+        self.kept = defaultdict(dict)     # {folder: {relative_path: [location, ...]}}
+        self.groups = {}  # {(folder, relative_path): [(folder, relative_path, path), ...]}
+        self.file_counts = {}  # {folder: files repomix would pack without dedup}
+        self.dir_counts = {}   # {folder: Counter({relative_dir: files below it})}
+
+    def ignore_patterns(self, folder):
+        """repomix ignore patterns for the duplicates in a folder.
+
+        A directory whose files are all duplicates is ignored with one
+        'dir/*' pattern rather than file by file; repomix checks every path
+        against every pattern, so a long list makes packing much slower.
+        """
+        ignored = self.ignored.get(folder, [])
+        counts = self.dir_counts.get(folder, {})
+        dropped = Counter(d for rel in ignored for d in _parent_dirs(rel))
+        patterns = []
+        seen = set()
+        for rel in ignored:
+            pattern = next((f"{d}/*" for d in _parent_dirs(rel) if dropped[d] == counts.get(d)), rel)
+            if pattern not in seen:
+                seen.add(pattern)
+                patterns.append(pattern)
+        return patterns
+
+    def has_files(self, folder):
+        """Whether any of a folder's files are left to pack"""
+        return self.file_counts.get(folder, 1) > len(self.ignored.get(folder, ()))
+
+    @property
+    def duplicate_count(self):
+        return sum(len(rels) for rels in self.ignored.values())
+
+    def restore(self, folder, relative_path):
+        """Pack every copy of a file again, returning the folders affected"""
+        members = self.groups.get((folder, relative_path), [])
+        locations = [path for _, _, path in members]
+        changed = set()
+        for member_folder, rel, _ in members:
+            if rel in self.ignored.get(member_folder, ()):
+                self.ignored[member_folder].remove(rel)
+                self.kept[member_folder][rel] = locations
+                changed.add(member_folder)
+        return changed
+
+
+def _parent_dirs(relative_path):
+    """Directories above a '/' separated path, outermost first"""
+    parts = relative_path.split('/')[:-1]
+    return ['/'.join(parts[:depth]) for depth in range(1, len(parts) + 1)]
+
+
+def _is_safe_pattern(relative_path):
+    return not (_GLOB_CHARS & set(relative_path)) and not relative_path.startswith('#')
+
+
+def plan_dedup(folders):
+    """Plan which duplicate files to drop from each folder.
+
+    The first copy of each file body, in folder order, is kept. Later
+    copies are dropped unless their path cannot be expressed as an exact
+    repomix ignore pattern, in which case they are kept as well.
+    """
+    by_size = defaultdict(list)
+    names = defaultdict(lambda: defaultdict(list))  # {folder: {path part: [rel, ...]}}
+    file_counts = defaultdict(int)
+    dir_counts = defaultdict(Counter)
+    for folder in folders:
+        for f in walk_files(folder):
+            file_counts[folder] += 1
+            dir_counts[folder].update(_parent_dirs(f.relative_path))
+            for part in f.relative_path.split('/'):
+                names[folder][part].append(f.relative_path)
+            # Empty files are trivially identical and not worth tracking
+            if f.size:
+                by_size[f.size].append((folder, f))
+
+    groups = defaultdict(list)
+    for candidates in by_size.values():
+        if len(candidates) < 2:
+            continue
+        for folder, f in candidates:
+            try:
+                groups[hash_file(f.path)].append((folder, f))
+            except OSError as e:
+                logger.warning(f"Skipping {f.path} for dedup: {e}")
+
+    # repomix leaves binary files out of every folder anyway
+    text_groups = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        try:
+            if _is_binary(members[0][1].path):
+                continue
+        except OSError as e:
+            logger.warning(f"Skipping {members[0][1].path} for dedup: {e}")
+            continue
+        text_groups.append(members)
+    groups = text_groups
+    dropped = set()
+    for members in groups:
+        members.sort(key=lambda m: (folders.index(m[0]), m[1].relative_path))
+        dropped.update((folder, f.relative_path) for folder, f in members[1:]
+                       if _is_safe_pattern(f.relative_path))
+
+    # repomix matches a slash-free pattern against every part of a path,
+    # so dropping a root-level 'config.yml' must not hide other config.yml
+    # files, or files below config.yml directories, that are being kept
+    for folder, rel in list(dropped):
+        if '/' not in rel and any((folder, other) not in dropped
+                                  for other in names[folder][rel]):
+            dropped.discard((folder, rel))
+
+    plan = DedupPlan()
+    plan.file_counts = {folder: file_counts[folder] for folder in folders}
+    plan.dir_counts = {folder: dir_counts[folder] for folder in folders}
+    for members in groups:
+        locations = [f.path for _, f in members]
+        entries = [(folder, f.relative_path, f.path) for folder, f in members]
+        for folder, f in members:
+            plan.groups[(folder, f.relative_path)] = entries
+            if (folder, f.relative_path) in dropped:
+                plan.ignored[folder].append(f.relative_path)
+            else:
+                plan.kept[folder][f.relative_path] = locations
+    return plan
+
+
+def restore_unpacked(plan, outputs):
+    """Check that the kept copy of every duplicate made it into the KB.
+
+    Should repomix have left a kept copy out after all, every other copy of
+    that file is restored to its folder's pack so its content isn't lost.
+
+    Args:
+        plan: DedupPlan used when packing, updated in place
+        outputs: {folder: packed markdown file} for each folder
+
+    Returns:
+        The folders that need packing again
+    """
+    changed = set()
+    for folder, kept in list(plan.kept.items()):
+        out_file = outputs.get(folder)
+        content = ""
+        if out_file and Path(out_file).exists():
+            with open(out_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+        sections = find_sections(content, kept)
+        for rel in list(kept):
+            if rel not in sections:
+                logger.warning(f"repomix did not pack {os.path.join(folder, rel)}; "
+                               f"packing its duplicates too")
+                changed |= plan.restore(folder, rel)
+    return changed
+
+
+def find_sections(content, relative_paths):
+    """Find the character span of each file's section in a repomix markdown pack.
+
+    Sections start at a '## <path>' heading outside any code fence and end
+    at the next top- or second-level heading.
+    """
+    wanted = set(relative_paths)
+    headings = []  # (offset, relative_path or None)
+    fence = None
+    offset = 0
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if fence:
+            if stripped.startswith(fence) and stripped.strip('`') == '':
+                fence = None
+        elif stripped.startswith('```'):
+            fence = stripped[:len(stripped) - len(stripped.lstrip('`'))]
+        elif line.startswith('## ') or line.startswith('# '):
+            heading = line[3:].strip() if line.startswith('## ') else None
+            headings.append((offset, heading if heading in wanted else None))
+        offset += len(line) + 1
+    headings.append((offset, None))
+
+    sections = {}
+    for (start, rel), (end, _) in zip(headings, headings[1:]):
+        if rel and rel not in sections:
+            sections[rel] = (start, end)
+    return sections
+
+
+def write_manifest(out_dir, plan, outputs):
+    """Record where each deduplicated file's section lives in the KB.
+
+    Args:
+        out_dir: Knowledge base directory
+        plan: DedupPlan used when packing
+        outputs: {folder: packed markdown file} for each folder
+    """
+    files = {}
+    for folder, out_file in outputs.items():
+        kept = plan.kept.get(folder)
+        if not kept or not Path(out_file).exists():
+            continue
+        with open(out_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        sections = find_sections(content, kept)
+        entries = [
+            {'path': rel, 'start': start, 'end': end, 'locations': kept[rel]}
+            for rel, (start, end) in sorted(sections.items(), key=lambda s: s[1])
+        ]
+        if entries:
+            files[Path(out_file).name] = entries
+
+    with open(Path(out_dir) / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'files': files}, f, indent=2)
+
+
+def load_manifest(kb_path):
+    """Load a KB's dedup manifest as {kb_file: [entry, ...]}"""
+    manifest_file = Path(kb_path) / MANIFEST_NAME
+    if not manifest_file.exists():
+        return {}
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable dedup manifest {manifest_file}: {e}")
+        return {}
+
+
+def packed_duplicates(kb_path, folders_by_file):
+    """Duplicates left out of each folder's pack when a KB was last built.
+
+    Derived from the dedup manifest: every location of a deduplicated file
+    that was not packed itself was ignored.
+
+    Args:
+        kb_path: Knowledge base directory
+        folders_by_file: {KB file name: source folder}
+
+    Returns:
+        {folder: {normalized path, ...}}
+    """
+    locations = set()
+    packed = set()
+    for kb_file, entries in load_manifest(kb_path).items():
+        folder = folders_by_file.get(kb_file)
+        for entry in entries:
+            locations.update(os.path.normpath(loc) for loc in entry['locations'])
+            if folder:
+                packed.add(os.path.normpath(os.path.join(folder, entry['path'])))
+
+    # Longest first, so a folder nested in another claims its own files
+    folders = sorted(folders_by_file.values(), key=len, reverse=True)
+    ignored = defaultdict(set)
+    for path in locations - packed:
+        folder = next((f for f in folders if path.startswith(os.path.join(f, ''))), None)
+        if folder:
+            ignored[folder].add(path)
+    return ignored
+
+
+def collapse_duplicates(snippets, manifest):
+    """Merge search hits on the same content into one result.
+
+    Hits are grouped by identical chunk text. Returns a list of
+    (snippet, kb_files, sources) in the original score order: kb_files
+    names the KB files the content was found in, and sources lists the
+    source files of a hit inside a deduplicated file's section (empty for
+    other hits).
+    """
+    merged = {}
+    for snippet in snippets:
+        file_path = str(snippet.file_path) if snippet.file_path else ""
+        sources = []
+        for entry in manifest.get(file_path, ()):
+            if entry['start'] <= snippet.start_char < entry['end']:
+                sources = entry['locations']
+                break
+
+        key = hashlib.sha1(snippet.full_chunk.encode('utf-8')).hexdigest()
+        if key in merged:
+            _, kb_files, known = merged[key]
+            if file_path not in kb_files:
+                kb_files.append(file_path)
+            known.extend(loc for loc in sources if loc not in known)
+        else:
+            merged[key] = (snippet, [file_path], list(sources))
+    return list(merged.values())
@@ -0,0 +1,232 @@
+"""
+docs-mcp source file walking
+
+Walks code folders the way repomix packs them: repomix's default ignore
+patterns, the folder's .repomixignore, .ignore and .gitignore, and nested
+.gitignore files, matched with repomix's own rules.
+"""
+
+import os
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# repomix's built-in ignore list, as of repomix 0.5. Prefer the installed
+# repomix's own list below; usually it only runs through uvx, though.
+DEFAULT_IGNORE_PATTERNS = [
+    # Version control
+    ".git", ".svn", ".hg", ".bzr", "_darcs", ".fossil", "CVS",
+    # IDEs and editors
+    ".idea", ".vscode", "*.swp", "*.swo", "*~", "*.bak", ".project",
+    ".settings", ".classpath", ".factorypath", "*.sublime-*", ".vs",
+    # Build outputs
+    "build", "dist", "out", "target", "*.pyc", "__pycache__", "*.class",
+    "*.o", "*.obj", "*.exe", "*.dll", "*.so", "*.dylib", "*.lib", "*.a",
+    # Dependency directories
+    "node_modules", "bower_components", "vendor", ".venv", "venv", "env",
+    ".env", ".tox", ".pytest_cache", ".coverage", "htmlcov",
+    # Package managers
+    "*.egg", "*.egg-info", "*.whl", "pip-log.txt", "npm-debug.log*",
+    "yarn-debug.log*", "yarn-error.log*", "package-lock.json", "yarn.lock",
+    "Pipfile.lock", "poetry.lock",
+    # Documentation and media
+    "docs/_build", "site", "*.pdf", "*.doc", "*.docx", "*.ppt", "*.pptx",
+    "*.xls", "*.xlsx", "*.jpg", "*.jpeg", "*.png", "*.gif", "*.ico",
+    "*.svg", "*.mp3", "*.mp4", "*.avi", "*.mov",
+    # System and temporary files
+    ".DS_Store", "Thumbs.db", "desktop.ini", "*.tmp", "*.temp", "*.log",
+    "*.pid", "*.cache",
+    # Security related
+    "*.key", "*.pem", "*.cert", "*.crt", "*.p12", "*.pfx", "*.jks",
+    "*.keystore",
+    # Archives and data files
+    "*.zip", "*.rar", "*.7z", "*.gz", "*.tar", "*.tgz", "*.db",
+    "*.sqlite", "*.sqlite3", "*.mdb", "*.csv",
+    # repomix's own files
+    ".repomix-output.*", ".repomixignore", "repomix.config.json",
+    # Python project artifacts (GitHub's Python .gitignore)
+    "__pycache__/", "*.py[cod]", "*$py.class", ".Python", "build/",
+    "develop-eggs/", "dist/", "downloads/", "eggs/", ".eggs/", "lib/",
+    "lib64/", "parts/", "sdist/", "var/", "wheels/", "share/python-wheels/",
+    "*.egg-info/", ".installed.cfg", "MANIFEST", "*.manifest", "*.spec",
+    "pip-delete-this-directory.txt", "htmlcov/", ".tox/", ".nox/",
+    ".coverage.*", ".cache", "nosetests.xml", "coverage.xml", "*.cover",
+    "*.py,cover", ".hypothesis/", ".pytest_cache/", "cover/", "*.mo",
+    "*.pot", "local_settings.py", "db.sqlite3", "db.sqlite3-journal",
+    "instance/", ".webassets-cache", ".scrapy", "docs/_build/", ".pybuilder/",
+    "target/", ".ipynb_checkpoints", "profile_default/", "ipython_config.py",
+    ".pdm.toml", ".pdm-python", ".pdm-build/", "__pypackages__/",
+    "celerybeat-schedule", "celerybeat.pid", "*.sage.py", "env/", "venv/",
+    "ENV/", "env.bak/", "venv.bak/", ".spyderproject", ".spyproject",
+    ".ropeproject", "/site", ".mypy_cache/", ".dmypy.json", "dmypy.json",
+    ".pyre/", ".pytype/", "cython_debug/",
+]
+
+try:
+    from repomix.config.default_ignore import default_ignore_list
+    DEFAULT_IGNORE_PATTERNS = list(default_ignore_list)
+except ImportError:
+    pass
+
+# Ignore files repomix reads from the folder root only
+ROOT_IGNORE_FILES = (".repomixignore", ".ignore", ".gitignore")
+
+# Ignore files repomix also reads in subdirectories
+NESTED_IGNORE_FILES = (".gitignore",)
+
+
+@dataclass
+class SourceFile:
+    """A file found while walking a code folder"""
+    path: str           # absolute path
+    relative_path: str  # path relative to the folder, '/' separated
+    size: int
+    ignored: bool
+
+
+def read_ignore_file(path):
+    """Read patterns from a gitignore-style file, skipping comments and negations"""
+    patterns = []
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                # Negated patterns are not supported; keeping the file is the safe choice
+                if line and not line.startswith(('#', '!')):
+                    patterns.append(line)
+    except OSError:
+        pass
+    return patterns
+
+
+def _matches(relative_path, name, patterns):
+    """Check a path against ignore patterns the way repomix does.
+
+    Each pattern is fnmatched against the path relative to the folder
+    root, where '*' also matches '/', and against the entry's own name;
+    a trailing '/' pattern is tried against both with a '/' appended.
+    Patterns from nested .gitignore files are matched the same way, not
+    relative to their directory, and a leading '/' never matches.
+    """
+    for pattern in patterns:
+        if pattern.startswith('./'):
+            pattern = pattern[2:]
+        if fnmatch(relative_path, pattern) or fnmatch(name, pattern):
+            return True
+        if pattern.endswith('/') and (fnmatch(relative_path + '/', pattern)
+                                      or fnmatch(name + '/', pattern)):
+            return True
+    return False
+
+
+def is_default_ignored(relative_path):
+    """Whether any part of a '/' separated path matches the default ignore patterns"""
+    parts = relative_path.split('/')
+    return any(
+        _matches('/'.join(parts[:i + 1]), name, DEFAULT_IGNORE_PATTERNS)
+        for i, name in enumerate(parts)
+    )
+
+
+def is_ignored(folder, relative_path):
+    """Whether a '/' separated path in a folder is left out by walk_files.
+
+    Applies the default patterns, the folder's root ignore files and the
+    nested .gitignore files of every directory above the path.
+    """
+    root = os.path.abspath(folder)
+    patterns = list(DEFAULT_IGNORE_PATTERNS)
+    for ignore_file in ROOT_IGNORE_FILES:
+        patterns += read_ignore_file(os.path.join(root, ignore_file))
+    parts = relative_path.split('/')
+    for i, name in enumerate(parts):
+        if i:
+            local = []
+            for ignore_file in NESTED_IGNORE_FILES:
+                local.extend(read_ignore_file(os.path.join(root, *parts[:i], ignore_file)))
+            if local:
+                patterns += local
+                if any(_matches('/'.join(parts[:j + 1]), parts[j], local) for j in range(i)):
+                    return True
+        if _matches('/'.join(parts[:i + 1]), name, patterns):
+            return True
+    return False
+
+
+def walk_files(folder, include_ignored=False, extra_patterns=(), workers=1):
+    """Yield a SourceFile for every file in a folder, in sorted order.
+
+    Files are filtered with the same rules repomix packs a folder with.
+    Ignored directories are pruned unless include_ignored is set, in which
+    case their files are yielded with ignored=True. With workers > 1 each
+    top-level directory is walked on its own thread.
+    """
+    root = os.path.abspath(folder)
+    patterns = DEFAULT_IGNORE_PATTERNS + list(extra_patterns)
+    for ignore_file in ROOT_IGNORE_FILES:
+        patterns = patterns + read_ignore_file(os.path.join(root, ignore_file))
+    if workers <= 1:
+        yield from _walk(root, "", patterns, False, include_ignored)
+        return
+
+    # Walk the root level here and hand each subdirectory to the pool
+    parts = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in _walk(root, "", patterns, False, include_ignored, descend=False):
+            if isinstance(item, SourceFile):
+                parts.append([item])
+            else:
+                parts.append(executor.submit(lambda args: list(_walk(*args)), item))
+        for part in parts:
+            yield from (part if isinstance(part, list) else part.result())
+
+
+def _walk(directory, relative_dir, patterns, ignored, include_ignored, descend=True):
+    """Yield files below a directory.
+
+    With descend=False, subdirectories are yielded as the argument tuples
+    for walking them instead of being walked.
+    """
+    if relative_dir and not ignored:
+        local = []
+        for ignore_file in NESTED_IGNORE_FILES:
+            local.extend(read_ignore_file(os.path.join(directory, ignore_file)))
+        if local:
+            patterns = patterns + local
+            # repomix also matches them against this directory's own path
+            parts = relative_dir.split('/')
+            ignored = any(_matches('/'.join(parts[:i + 1]), name, local)
+                          for i, name in enumerate(parts))
+            if ignored and not include_ignored:
+                return
+
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError:
+        return
+
+    for entry in entries:
+        relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if not is_dir and not entry.is_file(follow_symlinks=False):
+                continue
+            entry_ignored = ignored or _matches(relative_path, entry.name, patterns)
+            if entry_ignored and not include_ignored:
+                continue
+            if is_dir:
+                args = (entry.path, relative_path, patterns, entry_ignored, include_ignored)
+                if descend:
+                    yield from _walk(*args)
+                else:
+                    yield args
+            else:
+                yield SourceFile(
+                    path=entry.path,
+                    relative_path=relative_path,
+                    size=entry.stat(follow_symlinks=False).st_size,
+                    ignored=entry_ignored
+                )
+        except OSError:
+            continue
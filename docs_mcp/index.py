@@ -0,0 +1,552 @@
+"""
+docs-mcp search index
+
+Builds the chunk index used by knowledge base search. Chunking runs across a
+process pool so large knowledge bases build in parallel on every core,
+refreshes re-chunk only the files that changed, and the index is persisted
+in the KB directory so later processes can load it instead of rebuilding.
+"""
+
+import os
+import re
+import json
+import logging
+import tempfile
+import threading
+import multiprocessing
+from pathlib import Path
+from functools import cached_property
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from md_mcp.scanner import MarkdownScanner
+    from md_mcp.chunking import Chunk, MarkdownChunker, SearchSnippet
+except ImportError:
+    # Fallback if not installed (though it should be a dependency)
+    MarkdownScanner = None
+    MarkdownChunker = None
+    Chunk = None
+    SearchSnippet = None
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional; batch search falls back to scoring queries one at a time
+    np = None
+
+try:
+    # Match md-mcp's own query tokenization so results agree with search_chunks
+    from md_mcp.chunking import _query_terms
+except ImportError:
+    def _query_terms(query):
+        return [query.lower()]
+
+try:
+    from docs_mcp.dedup import MANIFEST_NAME, load_manifest, collapse_duplicates
+    from docs_mcp.kb import get_umask
+except ImportError:
+    from dedup import MANIFEST_NAME, load_manifest, collapse_duplicates
+    from kb import get_umask
+
+logger = logging.getLogger(__name__)
+
+# Environment variable overriding the default worker count
+WORKERS_ENV = "DOCS_MCP_INDEX_WORKERS"
+
+# Below this many bytes of markdown a process pool costs more than it
+# saves: chunking runs at roughly 20 MB/s per core, while each worker
+# process pays about a second importing md-mcp before it can start
+MIN_PARALLEL_BYTES = 32 * 1024 * 1024
+
+# Smallest piece a large file is split into for parallel chunking
+MIN_SHARD_CHARS = 1024 * 1024
+
+# MarkdownChunker's header pattern, applied to stripped lines
+_HEADER = re.compile(r'^(#{1,6})\s+(.+)$')
+# Lines that might be headers, so shard boundaries can be found without
+# looking at every line
+_HEADER_CANDIDATE = re.compile(r'^[^\S\n]*#', re.MULTILINE)
+
+# Per-term chunk count rows kept between batch searches
+TERM_CACHE_SIZE = 4096
+
+# Persisted index file inside the KB directory
+INDEX_NAME = ".search-index.json"
+INDEX_VERSION = 1
+
+
+def get_worker_count(workers=None):
+    """Resolve the number of index build workers.
+
+    An explicit value wins, then DOCS_MCP_INDEX_WORKERS, then the CPU count.
+    """
+    if workers is None:
+        env_value = os.environ.get(WORKERS_ENV, "").strip()
+        if env_value:
+            try:
+                workers = int(env_value)
+            except ValueError:
+                logger.warning(f"Ignoring invalid {WORKERS_ENV}={env_value!r}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, workers)
+
+
+def _chunk_file(task):
+    """Chunk a markdown file, or one shard of it, inside a worker process.
+
+    A task is (relative_path, path, text, offset, parent). text is None to
+    read the whole file from path; otherwise it is the shard starting at
+    character offset, and parent is the level 1 header line in effect
+    there (or None).
+
+    Returns the relative path and a compact list of
+    (content, header_path, start_char, end_char) tuples, which pickle far
+    smaller than full Chunk objects.
+    """
+    relative_path, path, text, offset, parent = task
+    if text is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    skip = 0
+    if parent:
+        # Replay the parent header so header paths match chunking the
+        # whole file, then drop the chunk it produces
+        text = parent + '\n' + text
+        skip = len(parent) + 1
+    chunker = MarkdownChunker()
+    return relative_path, [
+        (c.content, c.header_path, c.start_char - skip + offset, c.end_char - skip + offset)
+        for c in chunker.chunk_markdown(text, file_path=relative_path)
+        if c.start_char >= skip
+    ]
+
+
+def _shard(content, size):
+    """Split markdown at level 1 and 2 headers into pieces of about size chars.
+
+    Returns (offset, text, parent) tuples for _chunk_file. The chunker
+    starts a new section at every header and a level 1 or 2 header drops
+    everything below it from the header path, so chunking the shards and
+    shifting their offsets gives exactly the chunks of the whole file.
+    """
+    shards = []
+    start = 0
+    parent = None   # level 1 header in effect at the current shard's start
+    current = None  # level 1 header in effect at the scan position
+    for match in _HEADER_CANDIDATE.finditer(content):
+        line_start = match.start()
+        line_end = content.find('\n', line_start)
+        line = content[line_start:line_end if line_end != -1 else len(content)]
+        header = _HEADER.match(line.strip())
+        if not header or len(header.group(1)) > 2:
+            continue
+        if line_start - start >= size:
+            # Leave off the newline ending the shard; the chunker adds one
+            # back after the last line
+            shards.append((start, content[start:line_start - 1], parent))
+            start = line_start
+            parent = current if len(header.group(1)) == 2 else None
+        if len(header.group(1)) == 1:
+            current = line
+    shards.append((start, content[start:], parent))
+    return shards
+
+
+class _Snapshot:
+    """One version of an index's contents, never modified once built.
+
+    refresh() builds a new snapshot and swaps it in with a single
+    assignment, so a search holding the previous one keeps a consistent
+    view. Derived data is computed on first use; concurrent first uses may
+    both compute it, which is harmless.
+    """
+
+    def __init__(self, files=None, stamps=None, duplicates=None, manifest_stamp=None):
+        self.files = files or {}  # {relative_path: [Chunk, ...]}
+        self.stamps = stamps or {}  # {relative_path: (mtime_ns, size)} of indexed files
+        self.duplicates = duplicates or {}  # dedup manifest entries by file
+        self.manifest_stamp = manifest_stamp
+        self.term_rows = {}  # {term: (content counts capped at 5, in header)}
+
+    @cached_property
+    def chunks(self):
+        """All chunks, in file order"""
+        return [c for chunks in self.files.values() for c in chunks]
+
+    @cached_property
+    def lowered(self):
+        """(content, header path) of each chunk, lowercased"""
+        return [(c.content.lower(), c.header_path.lower()) for c in self.chunks]
+
+    @cached_property
+    def keys(self):
+        """Content key of each chunk, equal for duplicated content"""
+        return [hash(c.content) for c in self.chunks]
+
+
+class SearchIndex:
+    """Chunks of a knowledge base, grouped by markdown file.
+
+    Searches may run concurrently with each other and with refresh().
+    """
+
+    def __init__(self, kb_path, files=None, duplicates=None):
+        self.kb_path = str(kb_path)
+        self._snapshot = _Snapshot(files, duplicates=duplicates)
+        self._chunker = MarkdownChunker() if MarkdownChunker else None
+        self._lock = threading.Lock()  # serializes refreshes
+
+    @property
+    def files(self):
+        """{relative_path: [Chunk, ...]}"""
+        return self._snapshot.files
+
+    @property
+    def duplicates(self):
+        """Dedup manifest entries by file"""
+        return self._snapshot.duplicates
+
+    @property
+    def chunks(self):
+        """All chunks, in file order"""
+        return self._snapshot.chunks
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @classmethod
+    def load(cls, kb_path, workers=None):
+        """Load the index persisted in a KB, refreshing any files that changed.
+
+        Falls back to a full build when there is no usable persisted index,
+        and saves the result whenever something had to be re-chunked.
+        """
+        index = cls(kb_path)
+        index_file = Path(kb_path) / INDEX_NAME
+        if index_file.exists():
+            try:
+                with open(index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == INDEX_VERSION:
+                    files = {}
+                    stamps = {}
+                    for rel, entry in data['files'].items():
+                        stamps[rel] = tuple(entry['stamp'])
+                        files[rel] = [
+                            Chunk(content=content, header_path=header_path,
+                                  start_char=start, end_char=end, file_path=rel)
+                            for content, header_path, start, end in entry['chunks']
+                        ]
+                    index._snapshot = _Snapshot(files, stamps)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Ignoring unreadable search index {index_file}: {e}")
+                index = cls(kb_path)
+        if index.refresh(workers=workers) or not index_file.exists():
+            try:
+                index.save()
+            except OSError as e:
+                # Searching a KB must not need write access to it
+                logger.warning(f"Could not save search index in {kb_path}: {e}")
+        return index
+
+    def save(self):
+        """Persist the index in the KB directory"""
+        snapshot = self._snapshot
+        data = {
+            'version': INDEX_VERSION,
+            'files': {
+                rel: {
+                    'stamp': list(snapshot.stamps[rel]),
+                    'chunks': [[c.content, c.header_path, c.start_char, c.end_char]
+                               for c in chunks]
+                }
+                for rel, chunks in snapshot.files.items()
+            }
+        }
+        # Write to a temp file first so concurrent loaders never see a partial index
+        fd, tmp_path = tempfile.mkstemp(prefix=INDEX_NAME, dir=self.kb_path)
+        try:
+            # mkstemp creates the file 0600; other users load this index too
+            os.chmod(tmp_path, 0o666 & ~get_umask())
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, Path(self.kb_path) / INDEX_NAME)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def search(self, query, top_k=5):
+        """Search the index, returning the top_k (SearchSnippet, kb_files, sources).
+
+        Matches and scores chunks exactly like MarkdownChunker.search_chunks,
+        but lowercases chunk text once per index rather than twice per chunk
+        and query, extracts snippets only for results that are returned, and
+        collapses hits on duplicated content into one result.
+        """
+        snapshot = self._snapshot
+        chunks = snapshot.chunks
+        query_lower = query.lower()
+        terms = _query_terms(query)
+        scored = []
+        for i, (content_lower, header_lower) in enumerate(snapshot.lowered):
+            if query_lower in content_lower or any(
+                t in content_lower or t in header_lower for t in terms
+            ):
+                scored.append((_relevance(content_lower, header_lower, chunks[i].start_char,
+                                          query_lower, terms), i))
+        return self._top_results(snapshot, scored, query, top_k)
+
+    def search_batch(self, queries, top_k=5):
+        """Search many queries in one pass, returning a result list per query.
+
+        Results are identical to search(). The expensive part of scoring,
+        counting every query term in every chunk, is done once per distinct
+        term for the whole batch as rows of a term-document matrix (and
+        cached across batches). Each query is then scored over all chunks
+        with a handful of NumPy vector operations. Without NumPy, queries
+        are scored one at a time.
+        """
+        if np is None:
+            return [self.search(q, top_k=top_k) for q in queries]
+
+        snapshot = self._snapshot
+        chunks = snapshot.chunks
+        n = len(chunks)
+        if not n:
+            return [[] for _ in queries]
+
+        parsed = [(q, q.lower(), _query_terms(q)) for q in queries]
+        term_rows = _term_rows(snapshot, {t for _, _, terms in parsed for t in terms})
+        early = np.fromiter((c.start_char < 1000 for c in chunks), dtype=bool, count=n)
+
+        results = []
+        for query, query_lower, terms in parsed:
+            rows = [term_rows[t] for t in terms]
+            in_content = np.zeros(n, dtype=bool)
+            in_header = np.zeros(n, dtype=bool)
+            all_terms = np.ones(n, dtype=bool)
+            for counts, header in rows:
+                in_content |= counts > 0
+                in_header |= header
+                all_terms &= (counts > 0) | header
+
+            # A phrase contains each of its terms, so only chunks having all
+            # of them need the substring test (every chunk if there are none)
+            phrase = np.zeros(n, dtype=bool)
+            header_phrase = np.zeros(n, dtype=bool)
+            for i in np.nonzero(all_terms)[0].tolist():
+                content_lower, header_lower = snapshot.lowered[i]
+                phrase[i] = query_lower in content_lower
+                header_phrase[i] = query_lower in header_lower
+
+            # Same operations in the same order as calculate_relevance, so
+            # floating point scores match search() exactly
+            score = np.zeros(n)
+            score += np.where(phrase, 3.0, 0.0)
+            score += np.where(header_phrase, 2.0, 0.0)
+            for _, header in rows:
+                score += np.where(header & ~header_phrase, 1.0, 0.0)
+            for counts, _ in rows:
+                score += counts * 0.1
+            score += np.where(early, 0.5, 0.0)
+
+            matched = np.nonzero(phrase | in_content | in_header)[0]
+            # Stable descending sort keeps ties in file order
+            order = matched[np.argsort(-score[matched], kind='stable')]
+            scored = list(zip(score[order].tolist(), order.tolist()))
+            results.append(self._top_results(snapshot, scored, query, top_k, presorted=True))
+        return results
+
+    def _top_results(self, snapshot, scored, query, top_k, presorted=False):
+        """Turn (score, chunk index) pairs into the top_k collapsed results"""
+        # Stable sort keeps ties in file order, as search_chunks does
+        if not presorted:
+            scored.sort(key=lambda s: s[0], reverse=True)
+
+        # Keep the best top_k distinct contents plus their lower-scored
+        # duplicates, whose KB files and sources get merged in
+        keys = snapshot.keys
+        top_keys = set()
+        selected = []
+        for score, i in scored:
+            key = keys[i]
+            if key not in top_keys:
+                if len(top_keys) == top_k:
+                    continue
+                top_keys.add(key)
+            selected.append((score, i))
+
+        # Lower-scored duplicates only contribute KB files and sources, so
+        # skip extracting their snippets
+        chunks = snapshot.chunks
+        seen = set()
+        snippets = []
+        for score, i in selected:
+            key = keys[i]
+            snippets.append(SearchSnippet(
+                file_path=chunks[i].file_path,
+                header_path=chunks[i].header_path,
+                snippet=self._chunker.extract_snippet(chunks[i], query) if key not in seen else "",
+                full_chunk=chunks[i].content,
+                match_score=score,
+                start_char=chunks[i].start_char,
+                end_char=chunks[i].end_char
+            ))
+            seen.add(key)
+        return collapse_duplicates(snippets, snapshot.duplicates)[:top_k]
+
+    @classmethod
+    def build(cls, kb_path, workers=None):
+        """Scan and chunk every markdown file in a knowledge base.
+
+        Large knowledge bases are chunked across a process pool of `workers`
+        processes, with big files split at section boundaries. With a
+        single worker, a small KB, or a pool that cannot start, chunking
+        runs serially in the calling process.
+        """
+        index = cls(kb_path)
+        index.refresh(workers=workers)
+        return index
+
+    def refresh(self, workers=None, blocking=True):
+        """Re-chunk only the files added or changed since the last refresh.
+
+        The result is swapped in as a new snapshot, so searches already
+        running finish against the old one. With blocking=False, returns
+        straight away if another refresh is already running.
+
+        Returns the relative paths that were re-chunked or removed.
+        """
+        if not self._lock.acquire(blocking):
+            return []
+        try:
+            return self._refresh(workers)
+        finally:
+            self._lock.release()
+
+    def _refresh(self, workers):
+        current = self._snapshot
+        scanner = MarkdownScanner(self.kb_path)
+        stamps = {}
+        for f in scanner.scan():
+            st = f.path.stat()
+            stamps[str(f.relative_path)] = (str(f.path), (st.st_mtime_ns, st.st_size))
+
+        changed = [(path, rel, stamp[1]) for rel, (path, stamp) in stamps.items()
+                   if current.stamps.get(rel) != stamp]
+        removed = [rel for rel in current.files if rel not in stamps]
+
+        manifest_file = Path(self.kb_path) / MANIFEST_NAME
+        manifest_stamp = manifest_file.stat().st_mtime_ns if manifest_file.exists() else None
+        if not changed and not removed and manifest_stamp == current.manifest_stamp:
+            return []
+
+        files = {rel: current.files[rel] for rel in stamps if rel in current.files}
+        for relative_path, batch in _chunk_files(changed, workers).items():
+            files[relative_path] = [
+                Chunk(content=content, header_path=header_path,
+                      start_char=start, end_char=end, file_path=relative_path)
+                for content, header_path, start, end in batch
+            ]
+        duplicates = current.duplicates
+        if manifest_stamp != current.manifest_stamp:
+            duplicates = load_manifest(self.kb_path)
+
+        # Keep file order stable so results are deterministic
+        self._snapshot = _Snapshot(
+            {rel: files[rel] for rel in sorted(files)},
+            {rel: stamp for rel, (_, stamp) in stamps.items()},
+            duplicates,
+            manifest_stamp
+        )
+        return [rel for _, rel, _ in changed] + removed
+
+
+def _term_rows(snapshot, terms):
+    """Term-document matrix rows for terms, cached on the snapshot.
+
+    Returns {term: (content counts capped at 5, in header)}.
+    """
+    cache = snapshot.term_rows
+    missing = [t for t in terms if t not in cache]
+    if len(cache) + len(missing) > TERM_CACHE_SIZE:
+        cache.clear()
+    rows = {}
+    n = len(snapshot.lowered)
+    for term in terms:
+        row = cache.get(term)
+        if row is None:
+            counts = np.fromiter((c.count(term) for c, _ in snapshot.lowered),
+                                 dtype=np.int64, count=n)
+            counts = np.minimum(counts, 5).astype(np.uint8)
+            header = np.fromiter((term in h for _, h in snapshot.lowered), dtype=bool, count=n)
+            row = cache[term] = (counts, header)
+        rows[term] = row
+    return rows
+
+
+def _relevance(content_lower, header_lower, start_char, query_lower, terms):
+    """MarkdownChunker.calculate_relevance over pre-lowercased chunk text"""
+    score = 0.0
+    if query_lower in content_lower:
+        score += 3.0
+    if query_lower in header_lower:
+        score += 2.0
+    else:
+        for word in terms:
+            if word in header_lower:
+                score += 1.0
+    for word in terms:
+        score += min(content_lower.count(word), 5) * 0.1
+    if start_char < 1000:
+        score += 0.5
+    return score
+
+
+def _chunk_files(files, workers=None):
+    """Chunk (path, relative_path, size) files, in parallel when worthwhile.
+
+    A repomix KB has one large file per folder, so for parallel builds
+    files are split at section boundaries into shards, about four per
+    worker, rather than handed out whole.
+
+    Returns {relative_path: [(content, header_path, start_char, end_char), ...]}.
+    """
+    workers = get_worker_count(workers)
+    total = sum(size for _, _, size in files)
+    results = None
+    if workers > 1 and total >= MIN_PARALLEL_BYTES:
+        shard_chars = max(MIN_SHARD_CHARS, total // (workers * 4))
+        tasks = []
+        for path, rel, size in files:
+            if size < shard_chars * 2:
+                tasks.append((rel, path, None, 0, None))
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            tasks.extend((rel, path, text, offset, parent)
+                         for offset, text, parent in _shard(content, shard_chars))
+        try:
+            results = _chunk_parallel(tasks, workers)
+        except (OSError, BrokenProcessPool, NotImplementedError) as e:
+            logger.warning(f"Parallel index build failed, falling back to serial: {e}")
+    if results is None:
+        results = [_chunk_file((rel, path, None, 0, None)) for path, rel, _ in files]
+
+    # Shards come back in task order, so each file's chunks stay in order
+    chunked = {}
+    for relative_path, batch in results:
+        chunked.setdefault(relative_path, []).extend(batch)
+    return chunked
+
+
+def _chunk_parallel(tasks, workers):
+    """Chunk tasks across a process pool, preserving task order"""
+    # Builds run on web request and generation threads; forking a
+    # multithreaded process can copy a lock another thread holds into the
+    # workers, so start them fresh instead
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as executor:
+        return list(executor.map(_chunk_file, tasks))
@@ -0,0 +1,229 @@
+"""
+docs-mcp knowledge base packing
+
+Helpers for running repomix over code folders and for moving finished
+builds into place without readers ever seeing a partially written file.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+from pathlib import Path
+
+try:
+    from docs_mcp.dedup import restore_unpacked, write_manifest
+except ImportError:
+    from dedup import restore_unpacked, write_manifest
+
+logger = logging.getLogger(__name__)
+
+# Seconds a replaced KB version is kept after a rebuild swaps in a new one
+PREVIOUS_KB_GRACE_SECONDS = 30
+
+
+def get_config_dir():
+    """Get configuration directory path (DOCS_MCP_HOME overrides the default)"""
+    override = os.environ.get("DOCS_MCP_HOME")
+    if override:
+        return Path(override)
+    return Path.home() / ".docs-mcp"
+
+
+def get_kb_dir(name):
+    """Default directory of the knowledge base called name"""
+    return get_config_dir() / "kbs" / name
+
+
+def get_umask():
+    """The process umask, read without changing it where the OS allows"""
+    # os.umask() can only be read by setting it, which races with other
+    # threads creating files, so prefer Linux's /proc
+    try:
+        with open('/proc/self/status', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def get_repomix_env():
+    """Environment for repomix, forcing UTF-8 for Windows compatibility with emojis"""
+    env = os.environ.copy()
+    env["PYTHONUTF8"] = "1"
+    return env
+
+
+def get_repomix_command(folder_path, output_file, config=None):
+    """Build the repomix command that packs a folder into one markdown file"""
+    cmd = ["uvx", "repomix", "--output", str(output_file)]
+    if config:
+        cmd += ["--config", str(config)]
+    cmd.append(str(folder_path))
+    return cmd
+
+
+def write_repomix_config(folder_path, ignore):
+    """Write a temporary repomix config that ignores the given paths.
+
+    The patterns go in a config file because thousands of them on the
+    command line would exceed the OS limit on argument length. Any config
+    repomix would otherwise pick up, from the working directory or the
+    folder, is carried over. The caller deletes the returned file.
+    """
+    config = {}
+    for base in (os.getcwd(), folder_path):
+        existing = Path(base) / "repomix.config.json"
+        if existing.exists():
+            try:
+                config = json.loads(existing.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable repomix config {existing}: {e}")
+            break
+    ignore_config = config.setdefault('ignore', {})
+    ignore_config['custom_patterns'] = list(ignore_config.get('custom_patterns') or []) + list(ignore)
+
+    fd, path = tempfile.mkstemp(prefix="docs-mcp-repomix-", suffix=".json")
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return path
+
+
+def get_output_file(out_dir, folder):
+    """The packed markdown file for a folder"""
+    return Path(out_dir) / f"{os.path.basename(folder)}.md"
+
+
+def _run_repomix(folder, cmd, env):
+    subprocess.run(cmd, check=True, env=env)
+
+
+def pack_folders(folders, out_dir, plan=None, run=None, only=None):
+    """Pack folders into out_dir and write the dedup manifest.
+
+    Each folder is packed without its planned duplicates; a folder whose
+    files are all duplicates is skipped, as repomix fails when there is
+    nothing to pack. If repomix turns out to have left out the kept copy of
+    a duplicate, the other copies are restored and their folders packed
+    again. Packs are written to a temporary file and renamed into place.
+
+    Args:
+        folders: Every folder making up the knowledge base
+        out_dir: Knowledge base directory
+        plan: DedupPlan, or None to pack every file
+        run: Called as run(folder, cmd, env) to run repomix for a folder;
+            defaults to subprocess.run with check=True
+        only: Pack just these folders, keeping the others' existing packs
+
+    Returns:
+        {folder: packed markdown file} for the folders that have one
+    """
+    run = run or _run_repomix
+    env = get_repomix_env()
+    outputs = {folder: get_output_file(out_dir, folder) for folder in folders}
+    pending = [f for f in folders if only is None or f in only]
+    while pending:
+        for folder in pending:
+            if plan and not plan.has_files(folder):
+                logger.info(f"Nothing left to pack in {folder}; all its files are duplicates")
+                if outputs[folder].exists():
+                    outputs[folder].unlink()
+                continue
+            ignore = plan.ignore_patterns(folder) if plan else []
+            config = write_repomix_config(folder, ignore) if ignore else None
+            # Pack next to the output and rename it over, so a live KB
+            # never holds a half-written file
+            out_file = outputs[folder]
+            partial = out_file.with_name(f".{out_file.name}.partial")
+            try:
+                run(folder, get_repomix_command(folder, partial, config=config), env)
+                os.replace(partial, out_file)
+            finally:
+                if config:
+                    os.unlink(config)
+                if partial.exists():
+                    partial.unlink()
+            # md-mcp reloads on modify events but not on renames
+            os.utime(out_file)
+        # Each round only ever packs more files, so this settles quickly
+        changed = restore_unpacked(plan, outputs) if plan else set()
+        pending = [f for f in folders if f in changed]
+    if plan:
+        write_manifest(out_dir, plan, outputs)
+    return {folder: out_file for folder, out_file in outputs.items() if out_file.exists()}
+
+
+def create_staging_dir(out_dir):
+    """Create an empty directory next to out_dir to build a new KB version in"""
+    out_dir = Path(out_dir)
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    staging_dir = Path(tempfile.mkdtemp(prefix=f".{out_dir.name}.staging-", dir=out_dir.parent))
+    # mkdtemp creates the directory 0700, but it becomes the live KB, so
+    # give it the permissions a plain mkdir would
+    staging_dir.chmod(0o777 & ~get_umask())
+    return staging_dir
+
+
+def get_previous_dir(out_dir):
+    """Where the version replaced by the last swap is kept"""
+    out_dir = Path(out_dir)
+    return out_dir.parent / f".{out_dir.name}.previous"
+
+
+def swap_into_place(staging_dir, out_dir):
+    """Move a finished staging build into out_dir.
+
+    out_dir itself is kept, rather than replaced by the staging directory,
+    because running md-mcp servers watch it and would stop seeing changes
+    to a directory that has been renamed away. Each file is moved in with
+    an atomic rename, markdown packs first, and then touched so watchers
+    that ignore renames still see a modification. Files of the old version
+    that the new one lacks are moved to get_previous_dir(out_dir), whose
+    path is returned (None if nothing was left over). KB directories hold
+    files only.
+
+    A previous version older than PREVIOUS_KB_GRACE_SECONDS is deleted
+    first; a younger one may still have readers and is added to instead.
+    """
+    staging_dir = Path(staging_dir)
+    out_dir = Path(out_dir)
+    previous = get_previous_dir(out_dir)
+    if previous.exists() and time.time() - previous.stat().st_mtime > PREVIOUS_KB_GRACE_SECONDS:
+        shutil.rmtree(previous, ignore_errors=True)
+
+    if not out_dir.exists():
+        os.replace(staging_dir, out_dir)
+        return None
+
+    names = sorted(os.listdir(staging_dir), key=lambda n: (not n.endswith('.md'), n))
+    for name in names:
+        target = out_dir / name
+        os.replace(staging_dir / name, target)
+        # Same times, so stamps taken in the staging directory stay valid
+        st = target.stat()
+        os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    leftovers = [name for name in os.listdir(out_dir) if name not in names]
+    if not leftovers:
+        return None
+    previous.mkdir(exist_ok=True)
+    for name in leftovers:
+        os.replace(out_dir / name, previous / name)
+    os.utime(previous)
+    return previous
+
+
+def remove_previous(previous):
+    """Delete a version kept by swap_into_place once its grace period is over"""
+    if not previous or not Path(previous).exists():
+        return
+    # A later swap may have added files that still have readers
+    if time.time() - Path(previous).stat().st_mtime >= PREVIOUS_KB_GRACE_SECONDS:
+        shutil.rmtree(previous, ignore_errors=True)
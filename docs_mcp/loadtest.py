@@ -0,0 +1,248 @@
+"""
+docs-mcp web API load test
+
+Starts the web app against a synthetic knowledge base (or targets a running
+instance) and drives a mix of read endpoints at a fixed concurrency,
+reporting throughput, latency percentiles and error rates per endpoint.
+"""
+
+import os
+import json
+import math
+import time
+import random
+import logging
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Endpoint name -> (method, path)
+ENDPOINTS = {
+    'search': ('POST', '/api/search'),
+    'kbs': ('GET', '/api/kbs'),
+    'kb_status': ('GET', '/api/kb/status'),
+    'server_status': ('GET', '/api/server/status'),
+}
+
+DEFAULT_MIX = {'search': 6, 'kbs': 2, 'kb_status': 1, 'server_status': 1}
+
+_WORDS = (
+    "auth token session cache index query parser config handler router "
+    "request response client server worker queue retry timeout buffer "
+    "stream schema model record field value error logger metric event"
+).split()
+
+
+def parse_mix(spec):
+    """Parse 'search=6,kbs=2' into endpoint weights"""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight '{weight}' for {name}") from None
+        # random.choices needs a positive total, and a zero weight never runs
+        if not (mix[name] > 0 and math.isfinite(mix[name])):
+            raise ValueError(f"Weight for {name} must be a positive number, got '{weight}'")
+    return mix
+
+
+def create_synthetic_kb(kb_dir, files=20, sections=200, seed=0):
+    """Write a repomix-style knowledge base of random code sections"""
+    rng = random.Random(seed)
+    kb_dir = Path(kb_dir)
+    kb_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        lines = ["# Repository Files", ""]
+        for j in range(sections):
+            words = rng.choices(_WORDS, k=60)
+            lines += [
+                f"## src/module_{i}/file_{j}.py",
+                "",
+                "```python",
+                f"def {words[0]}_{words[1]}_{j}():",
+                f"    \"\"\"{' '.join(words[2:20])}\"\"\"",
+                f"    return '{' '.join(words[20:])}'",
+                "```",
+                "",
+            ]
+        (kb_dir / f"repo_{i}.md").write_text('\n'.join(lines), encoding='utf-8')
+    return kb_dir
+
+
+class _Recorder:
+    """Thread-safe per-endpoint latency and error collection"""
+
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _request(base_url, name, timeout):
+    method, path = ENDPOINTS[name]
+    data = None
+    headers = {}
+    if name == 'search':
+        query = ' '.join(random.sample(_WORDS, random.randint(1, 3)))
+        data = json.dumps({'query': query}).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    req = urllib.request.Request(base_url + path, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = json.loads(resp.read())
+            return resp.status == 200 and body.get('success', False)
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def run_load(base_url, concurrency=8, duration=10.0, requests=None, mix=None,
+             warmup=1, timeout=30.0):
+    """Drive the endpoints in `mix` at `concurrency` and report the results.
+
+    Runs for `duration` seconds, or until `requests` requests have been
+    sent if given. `warmup` search requests are sent first and not counted,
+    so the initial index build doesn't skew the numbers.
+    """
+    mix = mix or DEFAULT_MIX
+    names = list(mix)
+    weights = [mix[n] for n in names]
+
+    for _ in range(warmup):
+        _request(base_url, 'search', timeout)
+
+    recorder = _Recorder()
+    remaining = [requests] if requests else None
+    remaining_lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        while True:
+            if remaining is not None:
+                with remaining_lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            elif time.monotonic() >= deadline:
+                return
+            name = random.choices(names, weights)[0]
+            started = time.perf_counter()
+            ok = _request(base_url, name, timeout)
+            recorder.record(name, time.perf_counter() - started, ok)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    all_latencies = []
+    total_errors = 0
+    for name in names:
+        latencies = sorted(recorder.latencies[name])
+        all_latencies.extend(latencies)
+        total_errors += recorder.errors[name]
+        endpoints[name] = _summarize(latencies, recorder.errors[name], elapsed)
+
+    return {
+        'url': base_url,
+        'concurrency': concurrency,
+        'duration': round(elapsed, 3),
+        'total': _summarize(sorted(all_latencies), total_errors, elapsed),
+        'endpoints': endpoints,
+    }
+
+
+def _summarize(latencies, errors, elapsed):
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'throughput': round(count / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def run_local(files=20, sections=200, **kwargs):
+    """Start the web app on a synthetic KB in a temporary home and load test it"""
+    # Keep the app away from the user's real KBs and saved state
+    with tempfile.TemporaryDirectory(prefix="docs-mcp-loadtest-") as home:
+        previous_home = os.environ.get("DOCS_MCP_HOME")
+        os.environ["DOCS_MCP_HOME"] = home
+        try:
+            from werkzeug.serving import make_server
+            try:
+                from docs_mcp.web.app import app, state
+            except ImportError:
+                from web.app import app, state
+
+            kb_dir = create_synthetic_kb(Path(home) / "kbs" / "loadtest", files, sections)
+            # The app may be serving in this process; put its KB back afterwards
+            saved = (state.kb_name, state.kb_path, state.kb_status, state._search_cache)
+            state.kb_name = "loadtest"
+            state.kb_path = str(kb_dir)
+            state.kb_status = "ready"
+            state._search_cache = {}
+            try:
+                # Per-request access logs would dominate the run
+                logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+                server = make_server('127.0.0.1', 0, app, threaded=True)
+                thread = threading.Thread(target=server.serve_forever, daemon=True)
+                thread.start()
+                try:
+                    return run_load(f"http://127.0.0.1:{server.server_port}", **kwargs)
+                finally:
+                    server.shutdown()
+            finally:
+                state.kb_name, state.kb_path, state.kb_status, state._search_cache = saved
+        finally:
+            if previous_home is None:
+                os.environ.pop("DOCS_MCP_HOME", None)
+            else:
+                os.environ["DOCS_MCP_HOME"] = previous_home
+
+
+def format_report(report):
+    """Render a load test report as a text table"""
+    header = f"{'endpoint':<15}{'reqs':>8}{'rps':>10}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    lines = [
+        f"Target: {report['url']}  concurrency: {report['concurrency']}  "
+        f"duration: {report['duration']}s",
+        header,
+        '-' * len(header),
+    ]
+    rows = list(report['endpoints'].items()) + [('total', report['total'])]
+    for name, s in rows:
+        lines.append(
+            f"{name:<15}{s['requests']:>8}{s['throughput']:>10.1f}"
+            f"{s['error_rate'] * 100:>8.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+            f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,147 @@
+"""
+docs-mcp child process output
+
+Streams a subprocess's output line by line into a bounded ring buffer and a
+rotating log file, so long-running jobs neither accumulate their whole
+output in memory nor hide their progress until they exit. repomix progress
+and summary lines are parsed into structured metrics along the way.
+"""
+
+import re
+import logging
+import threading
+import subprocess
+from collections import deque
+from pathlib import Path
+from logging.handlers import RotatingFileHandler
+
+# Longest line kept; anything longer is split
+MAX_LINE_CHARS = 8192
+
+# Lines kept in memory per process
+DEFAULT_TAIL_LINES = 200
+
+# Rotating log size limits per job
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+_REPOMIX_TOTAL = re.compile(r'Total (Files|Characters|Chars|Tokens):\s*([\d,]+)', re.IGNORECASE)
+_PROGRESS = re.compile(r'\((\d+)/(\d+)\)')
+_METRIC_NAMES = {'files': 'files', 'characters': 'chars', 'chars': 'chars', 'tokens': 'tokens'}
+
+
+def parse_repomix_line(line, metrics):
+    """Update metrics from one line of repomix output.
+
+    Recognizes the summary totals ('Total Files: 12 files', 'Total
+    Characters: ...', 'Total Tokens: ...') and '(done/total)' progress
+    counters.
+    """
+    match = _REPOMIX_TOTAL.search(line)
+    if match:
+        metrics[_METRIC_NAMES[match.group(1).lower()]] = int(match.group(2).replace(',', ''))
+        return
+    match = _PROGRESS.search(line)
+    if match:
+        metrics['progress'] = [int(match.group(1)), int(match.group(2))]
+
+
+class OutputStream:
+    """Pumps a child's output into a ring buffer and rotating log on a thread
+
+    Args:
+        stream: Text stream to read (typically Popen.stdout)
+        log_file: Rotating log file to append every line to, or None
+        max_lines: Number of recent lines kept in memory
+        parser: Called as parser(line, metrics) for each line
+    """
+
+    def __init__(self, stream, log_file=None, max_lines=DEFAULT_TAIL_LINES, parser=None):
+        self.stream = stream
+        self.lines = deque(maxlen=max_lines)
+        self.line_count = 0
+        self.metrics = {}
+        self.parser = parser
+        self._lock = threading.Lock()
+        self._thread = None
+        self._handler = None
+        self._log = None
+        if log_file:
+            Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+            self._handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                                backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+            self._handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            # A private logger, so job output never reaches the app's log
+            self._log = logging.Logger(f"docs_mcp.output.{Path(log_file).stem}")
+            self._log.addHandler(self._handler)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def tail(self, n=None):
+        """The most recent lines, oldest first"""
+        with self._lock:
+            lines = list(self.lines)
+        return lines[-n:] if n else lines
+
+    def snapshot(self):
+        """Metrics plus the line count, safe to serialize"""
+        with self._lock:
+            return dict(self.metrics, output_lines=self.line_count)
+
+    def _pump(self):
+        try:
+            for raw in iter(lambda: self.stream.readline(MAX_LINE_CHARS), ''):
+                # Spinners redraw with carriage returns; keep the final state
+                line = raw.rstrip('\r\n').split('\r')[-1].rstrip()
+                if not line:
+                    continue
+                with self._lock:
+                    self.lines.append(line)
+                    self.line_count += 1
+                    if self.parser:
+                        self.parser(line, self.metrics)
+                if self._log:
+                    self._log.info(line)
+        except (OSError, ValueError):
+            # Stream closed underneath us
+            pass
+        finally:
+            if self._handler:
+                self._log.removeHandler(self._handler)
+                self._handler.close()
+
+
+def popen_streaming(cmd, env=None, log_file=None, parser=None, **kwargs):
+    """Start a process with stdout and stderr merged into an OutputStream"""
+    process = subprocess.Popen(
+        cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8', errors='replace', **kwargs
+    )
+    return process, OutputStream(process.stdout, log_file=log_file, parser=parser).start()
+
+
+def run_streaming(cmd, env=None, log_file=None, parser=parse_repomix_line, on_start=None):
+    """Run a process to completion, streaming its output.
+
+    on_start, if given, is called with the OutputStream as soon as the
+    process starts, so callers can report progress while it runs. Returns
+    the OutputStream. Raises CalledProcessError carrying the output tail on
+    a non-zero exit, like subprocess.run(check=True).
+    """
+    process, output = popen_streaming(cmd, env=env, log_file=log_file, parser=parser)
+    if on_start:
+        on_start(output)
+    returncode = process.wait()
+    output.join()
+    process.stdout.close()
+    if returncode:
+        tail = '\n'.join(output.tail())
+        raise subprocess.CalledProcessError(returncode, cmd, output=tail, stderr=tail)
+    return output
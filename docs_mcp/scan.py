@@ -0,0 +1,97 @@
+"""
+docs-mcp folder pre-scan
+
+Estimates how large a knowledge base a folder would produce before repomix
+runs, so oversized folders and build artifacts can be pruned up front.
+"""
+
+import os
+import time
+import threading
+from collections import defaultdict
+
+try:
+    from docs_mcp.files import walk_files
+except ImportError:
+    from files import walk_files
+
+# Rough characters-per-token ratio for source code
+BYTES_PER_TOKEN = 4
+
+# Seconds a scan result is reused while the folder itself is unchanged
+SCAN_CACHE_TTL = 60
+
+_cache = {}  # {(folder, top): (scanned_at, folder_mtime, result)}
+_cache_lock = threading.Lock()
+
+
+def scan_folder(folder, top=10, workers=None, refresh=False):
+    """Scan a folder and estimate the size of its packed knowledge base.
+
+    Args:
+        folder: Folder to scan
+        top: Number of largest files and directories to report
+        workers: Threads walking top-level directories (default: CPU count)
+        refresh: Ignore any cached result
+
+    Returns:
+        Dict with file count, bytes, estimated tokens, the largest files and
+        directories, and what the ignore rules exclude
+    """
+    folder = os.path.abspath(folder)
+    folder_mtime = os.stat(folder).st_mtime
+    key = (folder, top)
+
+    if not refresh:
+        with _cache_lock:
+            entry = _cache.get(key)
+        if entry and time.time() - entry[0] < SCAN_CACHE_TTL and entry[1] == folder_mtime:
+            return entry[2]
+
+    started = time.perf_counter()
+    file_count = total_bytes = excluded_files = excluded_bytes = 0
+    files = []
+    dirs = defaultdict(int)
+
+    for f in walk_files(folder, include_ignored=True, workers=workers or os.cpu_count() or 1):
+        if f.ignored:
+            excluded_files += 1
+            excluded_bytes += f.size
+            continue
+        file_count += 1
+        total_bytes += f.size
+        files.append((f.size, f.relative_path))
+        # Credit the file's bytes to every directory above it
+        parts = f.relative_path.split('/')[:-1]
+        for depth in range(1, len(parts) + 1):
+            dirs['/'.join(parts[:depth])] += f.size
+
+    files.sort(reverse=True)
+    result = {
+        'path': folder,
+        'file_count': file_count,
+        'total_bytes': total_bytes,
+        'estimated_tokens': total_bytes // BYTES_PER_TOKEN,
+        'excluded_files': excluded_files,
+        'excluded_bytes': excluded_bytes,
+        'largest_files': [
+            {'path': path, 'bytes': size} for size, path in files[:top]
+        ],
+        'largest_dirs': [
+            {'path': path, 'bytes': size}
+            for path, size in sorted(dirs.items(), key=lambda d: d[1], reverse=True)[:top]
+        ],
+        'duration': round(time.perf_counter() - started, 3)
+    }
+
+    with _cache_lock:
+        _cache[key] = (time.time(), folder_mtime, result)
+    return result
+
+
+def format_bytes(size):
+    """Human-readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
@@ -0,0 +1,254 @@
+"""
+docs-mcp watch mode
+
+Keeps a knowledge base in sync with its source folders. Changes are picked
+up through watchdog (inotify, FSEvents or ReadDirectoryChangesW) where
+available, with a polling fallback, debounced, and only the affected
+folders are re-packed.
+"""
+
+import os
+import time
+import logging
+import threading
+import subprocess
+from pathlib import Path
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    FileSystemEventHandler = object
+    WATCHDOG_AVAILABLE = False
+
+try:
+    from docs_mcp.files import walk_files, is_ignored, ROOT_IGNORE_FILES, NESTED_IGNORE_FILES
+    from docs_mcp.kb import get_output_file, pack_folders
+    from docs_mcp.dedup import MANIFEST_NAME, plan_dedup, packed_duplicates
+    from docs_mcp.output import run_streaming
+except ImportError:
+    from files import walk_files, is_ignored, ROOT_IGNORE_FILES, NESTED_IGNORE_FILES
+    from kb import get_output_file, pack_folders
+    from dedup import MANIFEST_NAME, plan_dedup, packed_duplicates
+    from output import run_streaming
+
+logger = logging.getLogger(__name__)
+
+
+class _FolderEventHandler(FileSystemEventHandler):
+    """Forwards relevant file events to the watcher"""
+
+    def __init__(self, watcher, folder):
+        super().__init__()
+        self.watcher = watcher
+        self.folder = folder
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed', 'closed_no_write'):
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path:
+                self.watcher.notify(self.folder, path)
+
+
+class KBWatcher:
+    """Watches code folders and re-packs the ones that change.
+
+    Args:
+        folders: Source folders making up the knowledge base
+        out_dir: Knowledge base directory
+        debounce: Seconds of quiet to wait for before re-packing
+        dedup: Store each unique file body once across folders
+        poll: Poll for changes instead of using native file events
+        interval: Seconds between polls
+        on_update: Called with the list of re-packed folders after each update
+    """
+
+    def __init__(self, folders, out_dir, debounce=2.0, dedup=True, poll=False,
+                 interval=1.0, on_update=None):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.out_dir = Path(os.path.abspath(out_dir))
+        self.debounce = debounce
+        self.dedup = dedup
+        self.poll = poll
+        self.interval = interval
+        self.on_update = on_update
+
+        self._dirty = set()
+        self._last_event = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._observer = None
+        self._poller = None
+        self._plan = None
+        self.mode = None
+
+    def get_output_file(self, folder):
+        return get_output_file(self.out_dir, folder)
+
+    def notify(self, folder, path):
+        """Record a change to a path inside a watched folder"""
+        path = os.path.abspath(path)
+        # Writes to the KB itself must not trigger another re-pack
+        if path.startswith(str(self.out_dir) + os.sep):
+            return
+        relative_path = os.path.relpath(path, folder).replace(os.sep, '/')
+        if relative_path == '.':
+            return
+        # Ignore files change what is packed even when they aren't packed
+        name = relative_path.rsplit('/', 1)[-1]
+        if ('/' not in relative_path and name in ROOT_IGNORE_FILES) or name in NESTED_IGNORE_FILES:
+            self._mark_dirty(folder)
+        elif not is_ignored(folder, relative_path):
+            self._mark_dirty(folder)
+
+    def _mark_dirty(self, folder):
+        with self._cond:
+            self._dirty.add(folder)
+            self._last_event = time.monotonic()
+            self._cond.notify_all()
+
+    def start(self):
+        """Pack any missing or out-of-date folders and start watching"""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stale = {f for f in self.folders if self._is_stale(f)}
+        has_manifest = (self.out_dir / MANIFEST_NAME).exists()
+        if self.dedup:
+            self._plan = plan_dedup(self.folders)
+            if has_manifest:
+                # Also folders whose duplicates moved since the KB was packed
+                before = packed_duplicates(
+                    self.out_dir, {self.get_output_file(f).name: f for f in self.folders})
+                stale.update(f for f in self.folders
+                             if {os.path.normpath(os.path.join(f, rel))
+                                 for rel in self._plan.ignored.get(f, ())} != before.get(f, set()))
+        if stale or (self.dedup and not has_manifest):
+            self._pack([f for f in self.folders if f in stale])
+
+        if WATCHDOG_AVAILABLE:
+            observer = PollingObserver(timeout=self.interval) if self.poll else Observer()
+            try:
+                for folder in self.folders:
+                    observer.schedule(_FolderEventHandler(self, folder), folder, recursive=True)
+                observer.start()
+                self._observer = observer
+                self.mode = "polling" if self.poll else "native"
+            except OSError as e:
+                # e.g. inotify watch limit reached; fall back to polling
+                logger.warning(f"Native file watching unavailable, polling instead: {e}")
+        if self._observer is None:
+            self._poller = threading.Thread(target=self._poll_loop, daemon=True)
+            self._poller.start()
+            self.mode = "polling"
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+    def run_forever(self):
+        """Re-pack changed folders once their changes settle, until stopped"""
+        while not self._stop.is_set():
+            with self._cond:
+                while not self._dirty and not self._stop.is_set():
+                    self._cond.wait()
+                # Wait for a quiet period so bursts of changes coalesce
+                while not self._stop.is_set():
+                    remaining = self._last_event + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                dirty, self._dirty = self._dirty, set()
+            if dirty and not self._stop.is_set():
+                self._update(dirty)
+
+    def _update(self, dirty):
+        to_pack = set(dirty)
+        folders = [f for f in self.folders if f in to_pack]
+        try:
+            if self.dedup:
+                # A change can make another folder's copy the canonical one, so
+                # also re-pack folders whose duplicate set moved
+                plan = plan_dedup(self.folders)
+                to_pack.update(f for f in self.folders
+                               if plan.ignore_patterns(f) != self._plan.ignore_patterns(f))
+                self._plan = plan
+                folders = [f for f in self.folders if f in to_pack]
+            self._pack(folders)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error re-packing {folders}: {e.stderr}")
+            return
+        except OSError as e:
+            # e.g. uvx missing, or a file removed mid-update; keep watching
+            logger.error(f"Error re-packing {folders}: {e}")
+            return
+        if self.on_update:
+            self.on_update(folders)
+
+    def _pack(self, folders):
+        pack_folders(self.folders, self.out_dir, self._plan, run=self._run, only=folders)
+
+    def _run(self, folder, cmd, env):
+        logger.info(f"Re-packing {folder}")
+        # Only the tail of repomix's output is kept, for error reports
+        output = run_streaming(cmd, env=env)
+        logger.info(f"Packed {output.snapshot().get('files', '?')} file(s) from {folder}")
+
+    def _is_stale(self, folder):
+        """Whether a folder has no pack, or has sources newer than its pack"""
+        out_file = self.get_output_file(folder)
+        if not out_file.exists():
+            return True
+        packed = out_file.stat().st_mtime_ns
+        # Directory times catch deleted and renamed files
+        directories = {folder}
+        for f in walk_files(folder):
+            directories.add(os.path.dirname(f.path))
+            try:
+                if os.stat(f.path).st_mtime_ns > packed:
+                    return True
+            except OSError:
+                return True
+        for path in list(directories) + [os.path.join(folder, n) for n in ROOT_IGNORE_FILES]:
+            try:
+                if os.stat(path).st_mtime_ns > packed:
+                    return True
+            except OSError:
+                continue
+        return False
+
+    def _snapshot(self, folder):
+        snapshot = {f.relative_path: (os.stat(f.path).st_mtime_ns, f.size)
+                    for f in walk_files(folder)}
+        # Root ignore files change what is packed without being packed
+        for name in ROOT_IGNORE_FILES:
+            path = os.path.join(folder, name)
+            if os.path.exists(path):
+                snapshot[name] = (os.stat(path).st_mtime_ns, os.path.getsize(path))
+        return snapshot
+
+    def _poll_loop(self):
+        """Fallback change detection when watchdog is not installed"""
+        snapshots = {}
+        for folder in self.folders:
+            try:
+                snapshots[folder] = self._snapshot(folder)
+            except OSError as e:
+                # Compared against on the next poll that succeeds
+                logger.warning(f"Could not scan {folder}: {e}")
+                snapshots[folder] = None
+        while not self._stop.wait(self.interval):
+            for folder in self.folders:
+                try:
+                    snapshot = self._snapshot(folder)
+                except OSError as e:
+                    logger.debug(f"Could not scan {folder}: {e}")
+                    continue
+                if snapshot != snapshots[folder]:
+                    snapshots[folder] = snapshot
+                    self._mark_dirty(folder)
@@ -8,6 +8,8 @@ Web interface for managing doc-mcp knowledge bases and MCP server.
 import os
 import sys
 import json
+import time
+import shutil
 import logging
 import webbrowser
 import threading
@@ -26,6 +28,22 @@ except ImportError:
     MarkdownScanner = None
     MarkdownChunker = None
 
+try:
+    from docs_mcp.index import SearchIndex
+    from docs_mcp.kb import (pack_folders, create_staging_dir, swap_into_place,
+                             remove_previous, get_config_dir, get_kb_dir,
+                             PREVIOUS_KB_GRACE_SECONDS)
+    from docs_mcp.dedup import plan_dedup
+    from docs_mcp.scan import scan_folder
+    from docs_mcp.output import run_streaming, popen_streaming
+except ImportError:
+    from index import SearchIndex
+    from kb import (pack_folders, create_staging_dir, swap_into_place, remove_previous,
+                    get_config_dir, get_kb_dir, PREVIOUS_KB_GRACE_SECONDS)
+    from dedup import plan_dedup
+    from scan import scan_folder
+    from output import run_streaming, popen_streaming
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,6 +57,9 @@ app.secret_key = os.urandom(24)
 
 import typing
 
+# Recent output lines returned by the status endpoints
+STATUS_TAIL_LINES = 20
+
 # Application state
 class AppState:
     """Global application state"""
@@ -47,17 +68,15 @@ class AppState:
     kb_path = None
     kb_status = "idle"  # idle | processing | ready
     mcp_server_processes: typing.Dict[str, typing.Any] = {}
+    mcp_server_outputs: typing.Dict[str, typing.Any] = {}  # {kb_name: OutputStream}
     generation_results = []
-    _search_cache = {} # {kb_path: (chunks, mtime)}
+    generation_progress = None  # {folder, index, total, output} while processing
+    index_workers = None  # None = DOCS_MCP_INDEX_WORKERS or CPU count
+    _search_cache = {} # {kb_path: SearchIndex}
     
 state = AppState()
 
 
-def get_config_dir():
-    """Get configuration directory path"""
-    return Path.home() / ".docs-mcp"
-
-
 def load_state():
     """Load application state from disk"""
     config_dir = get_config_dir()
@@ -120,21 +139,59 @@ def index():
 
 @app.route('/api/folders', methods=['GET'])
 def api_get_folders():
-    """Get list of selected folders"""
-    return jsonify({
-        'success': True,
-        'folders': [
-            {'path': folder, 'name': os.path.basename(folder)}
-            for folder in state.selected_folders
-        ]
-    })
+    """Get list of selected folders, with size estimates if ?scan=1"""
+    try:
+        scan = request.args.get('scan', '').lower() in ('1', 'true', 'yes')
+        folders = []
+        for folder in state.selected_folders:
+            entry = {'path': folder, 'name': os.path.basename(folder)}
+            if scan and os.path.isdir(folder):
+                entry['scan'] = scan_folder(folder)
+            folders.append(entry)
+        
+        return jsonify({
+            'success': True,
+            'folders': folders
+        })
+    except Exception as e:
+        logger.error(f"Error listing folders: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/folders/scan', methods=['POST'])
+def api_scan_folder():
+    """Estimate knowledge base size for a folder before adding or generating"""
+    try:
+        data = request.get_json() or {}
+        folder_path = data.get('path', '').strip()
+        
+        if not folder_path:
+            return jsonify({'success': False, 'message': 'No path provided'}), 400
+        
+        folder_path = os.path.abspath(folder_path)
+        if not os.path.isdir(folder_path):
+            return jsonify({'success': False, 'message': 'Path is not a directory'}), 400
+        
+        result = scan_folder(
+            folder_path,
+            top=int(data.get('top', 10)),
+            refresh=bool(data.get('refresh', False))
+        )
+        
+        return jsonify({
+            'success': True,
+            'scan': result
+        })
+    except Exception as e:
+        logger.error(f"Error scanning folder: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
 
 
 @app.route('/api/folders', methods=['POST'])
 def api_add_folder():
     """Add a folder to the selection"""
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         folder_path = data.get('path', '').strip()
         
         if not folder_path:
@@ -151,20 +208,30 @@ def api_add_folder():
         if folder_path in state.selected_folders:
             return jsonify({'success': False, 'message': 'Folder already added'}), 400
         
+        # Optional size estimate, taken before the folder is added so a
+        # failing scan never leaves the request half done
+        response = {'success': True}
+        if data.get('scan'):
+            try:
+                response['scan'] = scan_folder(folder_path)
+            except Exception as e:
+                logger.warning(f"Could not scan {folder_path}: {e}")
+                response['scan_error'] = str(e)
+        
         # Add folder
         state.selected_folders.append(folder_path)
         save_state()
         
         logger.info(f"Folder added: {folder_path}")
         
-        return jsonify({
-            'success': True,
+        response.update({
             'message': f'Added: {os.path.basename(folder_path)}',
             'folders': [
                 {'path': f, 'name': os.path.basename(f)}
                 for f in state.selected_folders
             ]
         })
+        return jsonify(response)
     
     except Exception as e:
         logger.error(f"Error adding folder: {e}")
@@ -260,6 +327,7 @@ def api_generate_kb():
     try:
         data = request.get_json()
         kb_name = data.get('kb_name', '').strip()
+        dedup = bool(data.get('dedup', True))
         
         if not kb_name:
             return jsonify({'success': False, 'message': 'Knowledge base name required'}), 400
@@ -278,38 +346,78 @@ def api_generate_kb():
                 logger.info(f"Starting KB generation: {kb_name}")
                 logger.info(f"Folders: {state.selected_folders}")
                 
-                output_dir = get_config_dir() / "kbs" / kb_name
-                
-                # Clear existing files in the KB directory
-                import shutil
-                if output_dir.exists():
-                    shutil.rmtree(output_dir)
-                output_dir.mkdir(parents=True, exist_ok=True)
+                output_dir = get_kb_dir(kb_name)
                 
                 # Make sure all selected folders are strings
                 folder_strs = [str(f) for f in state.selected_folders]
                 
-                # Use UTF-8 environment for Windows compatibility with emojis
-                env = os.environ.copy()
-                env["PYTHONUTF8"] = "1"
+                # Store each unique file body once across all folders
+                plan = None
+                if dedup:
+                    plan = plan_dedup(folder_strs)
+                    logger.info(f"Skipping {plan.duplicate_count} duplicate file(s)")
+                
+                results = {}
+                log_dir = get_config_dir() / "logs"
+                
+                def run(folder_path, cmd, env):
+                    skipped = len(plan.ignored.get(folder_path, ())) if plan else 0
+                    logger.info(f"Running repomix for {folder_path} ({skipped} duplicate(s) skipped)")
+                    
+                    def track(output):
+                        state.generation_progress = {
+                            'folder': folder_path,
+                            'index': folder_strs.index(folder_path),
+                            'total': len(folder_strs),
+                            'output': output
+                        }
+                    
+                    # Output goes to a rotating per-job log rather than memory
+                    output = run_streaming(cmd, env=env, on_start=track,
+                                           log_file=log_dir / f"generate-{kb_name}.log")
+                    metrics = output.snapshot()
+                    logger.info(f"repomix packed {metrics.get('files', '?')} file(s) from {folder_path}")
+                    results[folder_path] = {
+                        'folder': folder_path,
+                        'status': 'processed',
+                        'files': metrics.get('files', -1),
+                        'chars': metrics.get('chars', -1),
+                        'tokens': metrics.get('tokens', -1)
+                    }
                 
-                # Run repomix for each folder individually
-                for folder_path in folder_strs:
-                    folder_name = os.path.basename(folder_path)
-                    output_file = output_dir / f"{folder_name}.md"
+                # Build into a staging directory; the current KB keeps serving
+                # searches and MCP servers until the new files are moved in
+                staging_dir = create_staging_dir(output_dir)
+                try:
+                    pack_folders(folder_strs, staging_dir, plan, run=run)
                     
-                    cmd = ["uvx", "repomix", "--output", str(output_file), folder_path]
-                    logger.info(f"Running command: {' '.join(cmd)}")
+                    # Index the new version before it goes live so the first
+                    # search after the swap doesn't pay for the build
+                    index = SearchIndex.build(staging_dir, workers=state.index_workers)
+                    index.save()
                     
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env)
-                    logger.info(f"repomix output for {folder_name}: {result.stdout}")
+                    previous = swap_into_place(staging_dir, output_dir)
+                    index.kb_path = str(output_dir)
+                    state._search_cache[str(output_dir)] = index
+                finally:
+                    state.generation_progress = None
+                    # Only left behind if the build failed
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                
+                # Give in-flight readers of the old version time to finish
+                if previous:
+                    timer = threading.Timer(PREVIOUS_KB_GRACE_SECONDS, remove_previous, args=(previous,))
+                    timer.daemon = True
+                    timer.start()
                 
                 # Update state
                 state.kb_path = str(output_dir)
                 state.kb_status = "ready"
+                # Folders whose files were all duplicates have no pack of their own
                 state.generation_results = [
-                    {'folder': f, 'status': 'processed', 'files': -1} # repomix doesn't easily expose this
-                    for f in state.selected_folders
+                    results.get(f, {'folder': f, 'status': 'deduplicated', 'files': 0,
+                                    'chars': 0, 'tokens': 0})
+                    for f in folder_strs
                 ]
                 save_state()
                 
@@ -317,11 +425,12 @@ def api_generate_kb():
                 
             except subprocess.CalledProcessError as e:
                 logger.error(f"Error generating KB: {e.stderr}")
-                state.kb_status = "idle"
+                # The previous KB, if any, is untouched and still usable
+                state.kb_status = "ready" if state.kb_path else "idle"
                 save_state()
             except Exception as e:
                 logger.error(f"Error generating KB: {e}")
-                state.kb_status = "idle"
+                state.kb_status = "ready" if state.kb_path else "idle"
                 save_state()
         
         # Start background thread
@@ -342,13 +451,25 @@ def api_generate_kb():
 @app.route('/api/kb/status', methods=['GET'])
 def api_kb_status():
     """Get knowledge base status"""
+    progress = None
+    current = state.generation_progress
+    if current:
+        output = current['output']
+        progress = {
+            'folder': current['folder'],
+            'index': current['index'],
+            'total': current['total'],
+            'metrics': output.snapshot(),
+            'tail': output.tail(STATUS_TAIL_LINES)
+        }
     return jsonify({
         'success': True,
         'status': state.kb_status,
         'kb_name': state.kb_name,
         'kb_path': state.kb_path,
         'folder_count': len(state.selected_folders),
-        'results': state.generation_results
+        'results': state.generation_results,
+        'progress': progress
     })
 
 
@@ -361,7 +482,8 @@ def api_list_kbs():
         
         if kbs_dir.exists():
             for d in kbs_dir.iterdir():
-                if d.is_dir():
+                # Skip staging and previous versions from in-progress rebuilds
+                if d.is_dir() and not d.name.startswith('.'):
                     # Check if server is running
                     is_running = d.name in state.mcp_server_processes
                     
@@ -390,9 +512,7 @@ def api_remove_kb(kb_name):
     try:
         # Stop server if running
         if kb_name in state.mcp_server_processes:
-            process = state.mcp_server_processes[kb_name]
-            process.terminate()
-            state.mcp_server_processes.pop(kb_name, None)
+            stop_server_process(kb_name)
             logger.info(f"Stopped server for {kb_name}")
             
         # Try to remove from Claude Desktop config
@@ -406,7 +526,7 @@ def api_remove_kb(kb_name):
             logger.error(f"Failed to remove Claude Desktop config: {e}")
             
         # Delete directory
-        kb_path = get_config_dir() / "kbs" / kb_name
+        kb_path = get_kb_dir(kb_name)
         if kb_path.exists():
             import shutil
             shutil.rmtree(kb_path)
@@ -437,7 +557,7 @@ def api_start_server():
                 'message': 'Server is already running for this KB'
             }), 400
         
-        kb_path = get_config_dir() / "kbs" / kb_name
+        kb_path = get_kb_dir(kb_name)
         if not kb_path.exists():
             return jsonify({
                 'success': False,
@@ -452,8 +572,11 @@ def api_start_server():
         env = os.environ.copy()
         env["PYTHONUTF8"] = "1"
         
-        process = subprocess.Popen(cmd, env=env)
+        # Drain the server's output into a bounded buffer and rotating log
+        log_file = get_config_dir() / "logs" / f"server-{kb_name}.log"
+        process, output = popen_streaming(cmd, env=env, log_file=log_file)
         state.mcp_server_processes[kb_name] = process
+        state.mcp_server_outputs[kb_name] = output
         
         return jsonify({
             'success': True,
@@ -466,6 +589,16 @@ def api_start_server():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+def stop_server_process(kb_name):
+    """Terminate a KB's MCP server and release its output stream"""
+    process = state.mcp_server_processes.pop(kb_name)
+    output = state.mcp_server_outputs.pop(kb_name, None)
+    process.terminate()
+    if output:
+        # The pump finishes once the process closes its end of the pipe
+        output.join(timeout=5)
+
+
 @app.route('/api/server/stop', methods=['POST'])
 def api_stop_server():
     """Stop MCP server"""
@@ -482,9 +615,7 @@ def api_stop_server():
                 'message': 'Server is not running for this KB'
             }), 400
             
-        process = state.mcp_server_processes[kb_name]
-        process.terminate()
-        state.mcp_server_processes.pop(kb_name, None)
+        stop_server_process(kb_name)
         
         logger.info(f"MCP server stopped for {kb_name}")
         
@@ -512,26 +643,82 @@ def api_stop_server():
 def api_server_status():
     """Get all MCP servers status"""
     configs = {}
+    logs = {}
     for kb_name in state.mcp_server_processes.keys():
-        kb_path = str(get_config_dir() / "kbs" / kb_name)
+        kb_path = str(get_kb_dir(kb_name))
         configs[kb_name] = get_mcp_config(kb_name, kb_path)
+        output = state.mcp_server_outputs.get(kb_name)
+        logs[kb_name] = output.tail(STATUS_TAIL_LINES) if output else []
         
     return jsonify({
         'success': True,
         'running_servers': list(state.mcp_server_processes.keys()),
-        'configs': configs
+        'configs': configs,
+        'logs': logs
     })
 
 
+def get_search_index(kb_path):
+    """Get the cached search index for a KB, loading or refreshing it as needed"""
+    # Reuse the cached index, re-chunking only files changed since last search
+    index = state._search_cache.get(str(kb_path))
+    
+    if index is None:
+        logger.info(f"Loading search index for {kb_path}...")
+        index = SearchIndex.load(kb_path, workers=state.index_workers)
+        
+        state._search_cache[str(kb_path)] = index
+        logger.info(f"Loaded index with {len(index)} chunks")
+    else:
+        # A search arriving while another request refreshes uses the
+        # current version rather than waiting for the new one
+        changed = index.refresh(workers=state.index_workers, blocking=False)
+        if changed:
+            logger.info(f"Re-indexed {len(changed)} changed file(s) in {kb_path}")
+    
+    return index
+
+
+def search_unavailable():
+    """Error response if search can't run, or None if it can"""
+    # A rebuild leaves the current KB in place, so keep serving it
+    if not state.kb_path or not os.path.isdir(state.kb_path):
+        return jsonify({
+            'success': False,
+            'message': 'No knowledge base available'
+        }), 400
+    
+    if not MarkdownScanner or not MarkdownChunker:
+        return jsonify({
+            'success': False,
+            'message': 'md-mcp library not found. Search unavailable.'
+        }), 500
+    
+    return None
+
+
+def format_results(collapsed):
+    """JSON-ready search results from (SearchSnippet, kb_files, sources) tuples"""
+    return [
+        {
+            'file': str(s.file_path) if s.file_path else "",
+            'score': float(s.match_score),
+            'snippet': s.snippet,
+            'header': str(s.header_path) if s.header_path else "Root",
+            'kb_files': kb_files,
+            'sources': sources
+        }
+        for s, kb_files, sources in collapsed
+    ]
+
+
 @app.route('/api/search', methods=['POST'])
 def api_search():
     """Test search in knowledge base"""
     try:
-        if state.kb_status != "ready" or not state.kb_path:
-            return jsonify({
-                'success': False,
-                'message': 'No knowledge base available'
-            }), 400
+        error = search_unavailable()
+        if error:
+            return error
         
         data = request.get_json()
         query = data.get('query', '').strip()
@@ -539,63 +726,61 @@ def api_search():
         if not query:
             return jsonify({'success': False, 'message': 'Query required'}), 400
         
-        if not MarkdownScanner or not MarkdownChunker:
-            return jsonify({
-                'success': False,
-                'message': 'md-mcp library not found. Search unavailable.'
-            }), 500
+        index = get_search_index(Path(state.kb_path))
+        
+        # Perform search, collapsing hits on duplicated content into one result
+        collapsed = index.search(query, top_k=5)
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': format_results(collapsed)
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in search: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
 
-        if not state.kb_path:
-            return jsonify({
-                'success': False,
-                'message': 'Knowledge base path not set'
-            }), 400
 
-        kb_path = Path(state.kb_path)
+@app.route('/api/search/batch', methods=['POST'])
+def api_search_batch():
+    """Search many queries in one pass over the knowledge base"""
+    try:
+        error = search_unavailable()
+        if error:
+            return error
         
-        # Get all markdown files and chunk them
-        # Use cache if available and directory hasn't changed
-        current_mtime = kb_path.stat().st_mtime
-        cache_entry = state._search_cache.get(str(kb_path))
+        data = request.get_json() or {}
+        queries = data.get('queries')
+        top_k = data.get('top_k', 5)
         
-        if cache_entry and cache_entry[1] == current_mtime:
-            chunks = cache_entry[0]
-        else:
-            logger.info(f"Building search index for {kb_path}...")
-            scanner = MarkdownScanner(str(kb_path))
-            chunker = MarkdownChunker()
-            
-            files = scanner.scan()
-            chunks = []
-            for f in files:
-                f.load()
-                chunks.extend(chunker.chunk_markdown(f.content, file_path=f.relative_path))
-            
-            state._search_cache[str(kb_path)] = (chunks, current_mtime)
-            logger.info(f"Built index with {len(chunks)} chunks")
-
-        # Perform search
-        chunker = MarkdownChunker()
-        snippets = chunker.search_chunks(chunks, query, max_results=5)
-        
-        results = [
-            {
-                'file': str(s.file_path) if s.file_path else "",
-                'score': float(s.match_score),
-                'snippet': s.snippet,
-                'header': str(s.header_path) if s.header_path else "Root"
-            }
-            for s in snippets
-        ]
+        if not isinstance(queries, list) or not queries:
+            return jsonify({'success': False, 'message': 'queries must be a non-empty list'}), 400
+        
+        queries = [str(q).strip() for q in queries]
+        if not all(queries):
+            return jsonify({'success': False, 'message': 'Queries must not be empty'}), 400
+        
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k < 1:
+            return jsonify({'success': False, 'message': 'top_k must be a positive integer'}), 400
+        
+        index = get_search_index(Path(state.kb_path))
+        
+        started = time.perf_counter()
+        batch = index.search_batch(queries, top_k=top_k)
+        took_ms = (time.perf_counter() - started) * 1000
         
         return jsonify({
             'success': True,
-            'query': query,
-            'results': results
+            'took_ms': round(took_ms, 3),
+            'results': [
+                {'query': query, 'results': format_results(collapsed)}
+                for query, collapsed in zip(queries, batch)
+            ]
         })
     
     except Exception as e:
-        logger.error(f"Error in search: {e}")
+        logger.error(f"Error in batch search: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
@@ -611,8 +796,9 @@ def get_mcp_config(kb_name, kb_path):
     }
 
 
-def start_web_server(port=5000, host='127.0.0.1', open_browser=True):
+def start_web_server(port=5000, host='127.0.0.1', open_browser=True, index_workers=None):
     """Start the Flask web server"""
+    state.index_workers = index_workers
     url = f"http://{host}:{port}"
     
     print("\n" + "="*60)
@@ -653,6 +839,8 @@ def main():
                        help='Host to bind to (default: 127.0.0.1)')
     parser.add_argument('--no-browser', action='store_true',
                        help='Do not open browser automatically')
+    parser.add_argument('--index-workers', type=int, default=None,
+                       help='Processes used to build the search index (default: CPU count)')
     
     args = parser.parse_args()
     
@@ -660,7 +848,8 @@ def main():
         start_web_server(
             port=args.port,
             host=args.host,
-            open_browser=not args.no_browser
+            open_browser=not args.no_browser,
+            index_workers=args.index_workers
         )
     except KeyboardInterrupt:
         print("\n\nServer stopped.")
@@ -0,0 +1,183 @@
+"""Tests for duplicate planning and repomix pack parsing"""
+
+import json
+import os
+
+import pytest
+
+from docs_mcp.dedup import collapse_duplicates, find_sections, plan_dedup, restore_unpacked
+from docs_mcp.kb import pack_folders
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def pack(folder, out_file, ignore=()):
+    """Stand-in for repomix: a '## <path>' section for every file not ignored"""
+    lines = ["# Files", ""]
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            rel = os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/')
+            if rel in ignore or any(p.endswith('/*') and rel.startswith(p[:-1]) for p in ignore):
+                continue
+            with open(os.path.join(root, name), encoding='utf-8') as f:
+                lines += [f"## {rel}", "```", f.read(), "```", ""]
+    write(str(out_file), "\n".join(lines))
+
+
+def test_duplicate_kept_in_folder_repomix_packs(tmp_path):
+    # repomix ignores lib/ by default, so a's copy never reaches the KB and
+    # b's copy must not be dropped
+    write(f"{tmp_path}/a/lib/x.py", "shared = 1\n")
+    write(f"{tmp_path}/b/src/x.py", "shared = 1\n")
+    plan = plan_dedup([f"{tmp_path}/a", f"{tmp_path}/b"])
+    assert plan.duplicate_count == 0
+    assert not plan.ignored.get(f"{tmp_path}/b")
+
+
+def test_later_copies_ignored(tmp_path):
+    a, b = f"{tmp_path}/a", f"{tmp_path}/b"
+    write(f"{a}/x.py", "shared = 1\n")
+    write(f"{b}/y.py", "shared = 1\n")
+    write(f"{b}/own.py", "own = 1\n")
+    plan = plan_dedup([a, b])
+    assert plan.ignored[b] == ["y.py"]
+    assert plan.kept[a]["x.py"] == [f"{a}/x.py", f"{b}/y.py"]
+    assert plan.has_files(b)
+
+
+def test_root_name_not_dropped_when_it_would_hide_kept_files(tmp_path):
+    # A slash-free pattern matches every path part in repomix
+    a, b = f"{tmp_path}/a", f"{tmp_path}/b"
+    write(f"{a}/config.yml", "shared: 1\n")
+    write(f"{b}/config.yml", "shared: 1\n")
+    write(f"{b}/sub/config.yml", "own: 1\n")
+    plan = plan_dedup([a, b])
+    assert "config.yml" not in plan.ignored.get(b, [])
+
+
+def test_binary_duplicates_not_planned(tmp_path):
+    a, b = f"{tmp_path}/a", f"{tmp_path}/b"
+    for folder in (a, b):
+        os.makedirs(folder)
+        with open(f"{folder}/blob.dat", 'wb') as f:
+            f.write(b"\x00\x01\x02" * 10)
+    assert plan_dedup([a, b]).duplicate_count == 0
+
+
+def test_fully_duplicated_directory_collapses_to_one_pattern(tmp_path):
+    a, b = f"{tmp_path}/a", f"{tmp_path}/b"
+    for i in range(3):
+        write(f"{a}/third_party/pkg/m{i}.py", f"m = {i}\n")
+        write(f"{b}/third_party/pkg/m{i}.py", f"m = {i}\n")
+    write(f"{b}/app.py", "app = 1\n")
+    write(f"{b}/partial/dup.py", "m = 0\n")
+    write(f"{b}/partial/own.py", "own = 1\n")
+    plan = plan_dedup([a, b])
+    assert sorted(plan.ignore_patterns(b)) == ["partial/dup.py", "third_party/*"]
+
+
+def test_all_duplicate_folder_is_skipped(tmp_path):
+    a, b, kb = f"{tmp_path}/a", f"{tmp_path}/b", tmp_path / "kb"
+    write(f"{a}/x.py", "shared = 1\n")
+    write(f"{b}/x.py", "shared = 1\n")
+    plan = plan_dedup([a, b])
+    assert not plan.has_files(b)
+
+    packed = []
+
+    def run(folder, cmd, env):
+        packed.append(folder)
+        pack(folder, cmd[cmd.index("--output") + 1])
+
+    kb.mkdir()
+    outputs = pack_folders([a, b], kb, plan, run=run)
+    assert packed == [a]
+    assert list(outputs) == [a]
+    manifest = json.loads((kb / "dedup.json").read_text())
+    assert manifest["files"]["a.md"][0]["locations"] == [f"{a}/x.py", f"{b}/x.py"]
+
+
+def test_ignore_patterns_passed_in_config_file(tmp_path):
+    a, b, kb = f"{tmp_path}/a", f"{tmp_path}/b", tmp_path / "kb"
+    write(f"{a}/x.py", "shared = 1\n")
+    write(f"{b}/x.py", "shared = 1\n")
+    write(f"{b}/own.py", "own = 1\n")
+    plan = plan_dedup([a, b])
+    configs = {}
+
+    def run(folder, cmd, env):
+        if "--config" in cmd:
+            with open(cmd[cmd.index("--config") + 1], encoding='utf-8') as f:
+                configs[folder] = json.load(f)
+        pack(folder, cmd[cmd.index("--output") + 1], plan.ignore_patterns(folder))
+
+    kb.mkdir()
+    pack_folders([a, b], kb, plan, run=run)
+    assert configs == {b: {"ignore": {"custom_patterns": ["x.py"]}}}
+    assert "## x.py" not in (kb / "b.md").read_text()
+    assert not [p for p in kb.iterdir() if p.suffix != ".md" and p.name != "dedup.json"]
+
+
+def test_restore_unpacked_repacks_lost_copies(tmp_path):
+    a, b, kb = f"{tmp_path}/a", f"{tmp_path}/b", tmp_path / "kb"
+    write(f"{a}/x.py", "shared = 1\n")
+    write(f"{b}/x.py", "shared = 1\n")
+    write(f"{b}/own.py", "own = 1\n")
+    plan = plan_dedup([a, b])
+    kb.mkdir()
+    outputs = {a: kb / "a.md", b: kb / "b.md"}
+    # a's pack is missing its kept copy
+    write(str(outputs[a]), "# Files\n")
+    pack(b, outputs[b], plan.ignore_patterns(b))
+
+    assert restore_unpacked(plan, outputs) == {b}
+    assert plan.duplicate_count == 0
+    assert plan.kept[b]["x.py"] == [f"{a}/x.py", f"{b}/x.py"]
+
+
+def test_find_sections_skips_fenced_headings():
+    content = "\n".join([
+        "# Files",
+        "",
+        "## a.md",
+        "```markdown",
+        "## b.py",
+        "```",
+        "",
+        "## b.py",
+        "```",
+        "x = 1",
+        "```",
+        "",
+        "# Instruction",
+    ])
+    sections = find_sections(content, ["a.md", "b.py", "missing.py"])
+    assert set(sections) == {"a.md", "b.py"}
+    start, end = sections["b.py"]
+    assert content[start:end].startswith("## b.py\n```\nx = 1")
+    assert "# Instruction" not in content[start:end]
+    start, end = sections["a.md"]
+    assert content[start:end].count("## b.py") == 1
+
+
+def test_collapse_duplicates_separates_kb_files_and_sources():
+    chunking = pytest.importorskip("md_mcp.chunking")
+
+    def hit(file_path, start, text):
+        return chunking.SearchSnippet(file_path=file_path, header_path="h", snippet="",
+                                      full_chunk=text, match_score=1.0,
+                                      start_char=start, end_char=start + len(text))
+
+    manifest = {"a.md": [{"path": "x.py", "start": 0, "end": 50,
+                          "locations": ["/src/a/x.py", "/src/b/x.py"]}]}
+    results = collapse_duplicates(
+        [hit("a.md", 10, "dedup"), hit("a.md", 100, "same"), hit("b.md", 5, "same")],
+        manifest)
+    assert [(kb_files, sources) for _, kb_files, sources in results] == [
+        (["a.md"], ["/src/a/x.py", "/src/b/x.py"]),
+        (["a.md", "b.md"], []),
+    ]
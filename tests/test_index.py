@@ -0,0 +1,138 @@
+"""Tests for the search index"""
+
+import os
+import stat
+import threading
+
+import pytest
+
+from docs_mcp.index import SearchIndex, _chunk_file, _shard
+
+md_mcp_chunking = pytest.importorskip("md_mcp.chunking")
+
+QUERIES = ["alpha", "beta gamma", "def main", "section 3", "Header", "missing", "the"]
+
+
+def make_kb(path, files=3, sections=8):
+    path.mkdir(exist_ok=True)
+    for n in range(files):
+        lines = [f"# File {n}", ""]
+        for s in range(sections):
+            lines += [f"## Section {s} of {n}", "",
+                      f"alpha {n} {s} " + "beta " * (s % 4) + ("gamma " if s % 3 else ""),
+                      "```python", f"def main_{n}_{s}():", f"    return {s}", "```", ""]
+            if s % 2:
+                lines += [f"### Header {s}", "", f"the beta gamma text {n}.{s}", ""]
+        (path / f"file{n}.md").write_text("\n".join(lines), encoding='utf-8')
+    return path
+
+
+def as_tuples(results):
+    return [(r.file_path, r.header_path, r.match_score, r.start_char) for r, _, _ in results]
+
+
+def test_search_matches_search_chunks(tmp_path):
+    index = SearchIndex.build(make_kb(tmp_path / "kb"), workers=1)
+    chunker = md_mcp_chunking.MarkdownChunker()
+    for query in QUERIES:
+        expected = chunker.search_chunks(index.chunks, query, max_results=5)
+        assert as_tuples(index.search(query, top_k=5)) == [
+            (r.file_path, r.header_path, r.match_score, r.start_char) for r in expected
+        ]
+
+
+def test_search_batch_matches_search(tmp_path):
+    pytest.importorskip("numpy")
+    index = SearchIndex.build(make_kb(tmp_path / "kb"), workers=1)
+    batch = index.search_batch(QUERIES, top_k=5)
+    assert [as_tuples(r) for r in batch] == [as_tuples(index.search(q, top_k=5)) for q in QUERIES]
+    # Again with every term row cached
+    batch = index.search_batch(QUERIES, top_k=5)
+    assert [as_tuples(r) for r in batch] == [as_tuples(index.search(q, top_k=5)) for q in QUERIES]
+
+
+def test_load_and_refresh(tmp_path):
+    kb = make_kb(tmp_path / "kb")
+    index = SearchIndex.load(kb, workers=1)
+    count = len(index)
+    assert (kb / ".search-index.json").exists()
+    assert len(SearchIndex.load(kb, workers=1)) == count
+
+    (kb / "file0.md").unlink()
+    (kb / "extra.md").write_text("# Extra\n\nalpha\n", encoding='utf-8')
+    assert sorted(index.refresh(workers=1)) == ["extra.md", "file0.md"]
+    assert sorted(index.files) == ["extra.md", "file1.md", "file2.md"]
+    assert index.refresh(workers=1) == []
+
+
+def test_saved_index_follows_umask(tmp_path):
+    kb = make_kb(tmp_path / "kb", files=1)
+    old = os.umask(0o022)
+    try:
+        SearchIndex.load(kb, workers=1)
+    finally:
+        os.umask(old)
+    assert stat.S_IMODE((kb / ".search-index.json").stat().st_mode) == 0o644
+
+
+def test_load_without_write_access(tmp_path, monkeypatch):
+    kb = make_kb(tmp_path / "kb", files=1)
+
+    def save(self):
+        raise PermissionError("read-only")
+
+    monkeypatch.setattr(SearchIndex, 'save', save)
+    assert len(SearchIndex.load(kb, workers=1)) > 0
+
+
+def test_concurrent_search_and_refresh(tmp_path):
+    kb = make_kb(tmp_path / "kb")
+    index = SearchIndex.build(kb, workers=1)
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                index.search("alpha beta")
+                index.search_batch(QUERIES[:3])
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for t in threads:
+        t.start()
+    try:
+        for i in range(20):
+            extra = kb / "extra.md"
+            if i % 2:
+                extra.unlink()
+            else:
+                extra.write_text(f"# Extra {i}\n\nalpha beta {i}\n", encoding='utf-8')
+            index.refresh(workers=1)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    assert errors == []
+
+
+def test_refresh_without_blocking(tmp_path):
+    kb = make_kb(tmp_path / "kb", files=1)
+    index = SearchIndex.build(kb, workers=1)
+    (kb / "extra.md").write_text("# Extra\n\nalpha\n", encoding='utf-8')
+    with index._lock:
+        assert index.refresh(workers=1, blocking=False) == []
+    assert index.refresh(workers=1, blocking=False) == ["extra.md"]
+
+
+def test_shards_chunk_like_whole_file(tmp_path):
+    kb = make_kb(tmp_path / "kb", files=1, sections=40)
+    content = (kb / "file0.md").read_text(encoding='utf-8')
+    whole = _chunk_file(("file0.md", str(kb / "file0.md"), None, 0, None))[1]
+    shards = _shard(content, 200)
+    assert len(shards) > 1
+    sharded = []
+    for offset, text, parent in shards:
+        sharded += _chunk_file(("file0.md", None, text, offset, parent))[1]
+    assert sharded == whole
@@ -0,0 +1,93 @@
+"""Tests for packing helpers and moving builds into place"""
+
+import os
+import time
+
+import pytest
+
+from docs_mcp import kb
+from docs_mcp.kb import create_staging_dir, get_previous_dir, remove_previous, swap_into_place
+
+
+def build(out_dir, files):
+    staging_dir = create_staging_dir(out_dir)
+    for name, text in files.items():
+        (staging_dir / name).write_text(text, encoding='utf-8')
+    return staging_dir
+
+
+def test_first_build_moves_staging_dir(tmp_path):
+    out_dir = tmp_path / "kbs" / "kb"
+    staging_dir = build(out_dir, {"a.md": "# A\n"})
+    assert swap_into_place(staging_dir, out_dir) is None
+    assert (out_dir / "a.md").read_text() == "# A\n"
+    assert not staging_dir.exists()
+
+
+def test_rebuild_keeps_directory_and_stamps(tmp_path):
+    out_dir = tmp_path / "kb"
+    swap_into_place(build(out_dir, {"a.md": "old", "b.md": "old"}), out_dir)
+    inode = out_dir.stat().st_ino
+
+    staging_dir = build(out_dir, {"a.md": "new", "dedup.json": "{}"})
+    mtime = (staging_dir / "a.md").stat().st_mtime_ns
+    previous = swap_into_place(staging_dir, out_dir)
+
+    assert out_dir.stat().st_ino == inode
+    assert sorted(os.listdir(out_dir)) == ["a.md", "dedup.json"]
+    assert (out_dir / "a.md").read_text() == "new"
+    # Stamps taken while indexing the staging build stay valid
+    assert (out_dir / "a.md").stat().st_mtime_ns == mtime
+    assert previous == get_previous_dir(out_dir)
+    assert (previous / "b.md").read_text() == "old"
+
+
+def test_previous_kept_for_grace_period(tmp_path, monkeypatch):
+    out_dir = tmp_path / "kb"
+    swap_into_place(build(out_dir, {"a.md": "a", "b.md": "b"}), out_dir)
+    previous = swap_into_place(build(out_dir, {"a.md": "a"}), out_dir)
+    remove_previous(previous)
+    assert (previous / "b.md").exists()
+
+    monkeypatch.setattr(kb, 'PREVIOUS_KB_GRACE_SECONDS', 0)
+    time.sleep(0.01)
+    remove_previous(previous)
+    assert not previous.exists()
+
+
+def test_staging_dir_follows_umask(tmp_path):
+    old = os.umask(0o022)
+    try:
+        staging_dir = create_staging_dir(tmp_path / "kb")
+    finally:
+        os.umask(old)
+    assert staging_dir.stat().st_mode & 0o777 == 0o755
+
+
+def test_watchers_see_rebuilds(tmp_path):
+    observers = pytest.importorskip("watchdog.observers")
+    events = pytest.importorskip("watchdog.events")
+    out_dir = tmp_path / "kb"
+    swap_into_place(build(out_dir, {"a.md": "old"}), out_dir)
+
+    seen = []
+
+    class Handler(events.FileSystemEventHandler):
+        def on_any_event(self, event):
+            seen.append((event.event_type, os.path.basename(event.src_path)))
+
+    # Set up the way md-mcp watches a KB
+    observer = observers.Observer()
+    observer.schedule(Handler(), str(out_dir), recursive=True)
+    observer.start()
+    try:
+        swap_into_place(build(out_dir, {"a.md": "new"}), out_dir)
+        time.sleep(0.5)
+        assert ("modified", "a.md") in seen
+        seen.clear()
+        (out_dir / "a.md").write_text("edited", encoding='utf-8')
+        time.sleep(0.5)
+        assert ("modified", "a.md") in seen
+    finally:
+        observer.stop()
+        observer.join()
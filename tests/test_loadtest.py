@@ -0,0 +1,26 @@
+"""Tests for the web API load test"""
+
+import pytest
+
+from docs_mcp.loadtest import parse_mix, run_local
+
+
+def test_parse_mix():
+    assert parse_mix("search=6, kbs=2,kb_status") == {'search': 6.0, 'kbs': 2.0, 'kb_status': 1.0}
+
+
+@pytest.mark.parametrize('spec', ["search=0", "search=-1", "search=nan", "search=x", "nope=1"])
+def test_parse_mix_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_mix(spec)
+
+
+def test_run_local_restores_app_state(tmp_path):
+    pytest.importorskip("flask")
+    from docs_mcp.web.app import state
+
+    before = (state.kb_name, state.kb_path, state.kb_status, state._search_cache)
+    report = run_local(files=1, sections=5, concurrency=2, requests=10, mix={'search': 1})
+    assert report['total']['requests'] == 10
+    assert (state.kb_name, state.kb_path, state.kb_status, state._search_cache) == before
+    assert state._search_cache is before[3]
@@ -0,0 +1,102 @@
+"""Tests for watch mode"""
+
+import os
+
+import pytest
+
+from docs_mcp.dedup import find_sections
+from docs_mcp.watch import KBWatcher
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def make_watcher(tmp_path, folders, **options):
+    watcher = KBWatcher(folders, tmp_path / "kb", **options)
+    watcher.packed = []
+
+    def run(folder, cmd, env):
+        # Stand-in for repomix, which only needs to write some pack here
+        watcher.packed.append(folder)
+        sections = [f"## {name}\n" for name in sorted(os.listdir(folder))
+                    if os.path.isfile(os.path.join(folder, name))]
+        write(cmd[cmd.index("--output") + 1], "# Files\n\n" + "\n".join(sections))
+
+    watcher._run = run
+    return watcher
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = str(tmp_path / "src")
+    write(f"{folder}/a.py", "a = 1\n")
+    write(f"{folder}/.gitignore", ".cache_out/\n")
+    return folder
+
+
+def test_notify_applies_ignore_files(tmp_path, folder):
+    watcher = make_watcher(tmp_path, [folder])
+    watcher.notify(folder, f"{folder}/.cache_out/x.bin")
+    watcher.notify(folder, f"{folder}/node_modules/m.js")
+    assert not watcher._dirty
+    watcher.notify(folder, f"{folder}/a.py")
+    assert watcher._dirty == {folder}
+    watcher._dirty.clear()
+    watcher.notify(folder, f"{folder}/.gitignore")
+    assert watcher._dirty == {folder}
+
+
+def test_start_repacks_stale_folders_only(tmp_path, folder):
+    other = str(tmp_path / "other")
+    write(f"{other}/b.py", "b = 1\n")
+    watcher = make_watcher(tmp_path, [folder, other])
+    watcher.start()
+    watcher.stop()
+    assert watcher.packed == [folder, other]
+
+    # Sources older than their packs: nothing to do
+    watcher = make_watcher(tmp_path, [folder, other])
+    watcher.start()
+    watcher.stop()
+    assert watcher.packed == []
+
+    past = os.stat(watcher.get_output_file(other)).st_mtime - 10
+    os.utime(watcher.get_output_file(other), (past, past))
+    watcher = make_watcher(tmp_path, [folder, other])
+    watcher.start()
+    watcher.stop()
+    assert watcher.packed == [other]
+
+
+def test_start_repacks_when_duplicates_moved(tmp_path, folder):
+    other = str(tmp_path / "other")
+    write(f"{other}/b.py", "b = 1\n")
+    watcher = make_watcher(tmp_path, [folder, other])
+    watcher.start()
+    watcher.stop()
+
+    # other's b.py now duplicates a file in folder, but both packs are newer
+    # than the sources; other must drop its copy
+    write(f"{folder}/b.py", "b = 1\n")
+    for f in (folder, other):
+        os.utime(watcher.get_output_file(f))
+    watcher = make_watcher(tmp_path, [folder, other])
+    watcher.start()
+    watcher.stop()
+    assert watcher.packed == [other]
+
+
+def test_update_survives_errors(tmp_path, folder):
+    watcher = make_watcher(tmp_path, [folder])
+    watcher.start()
+    watcher.stop()
+
+    def run(folder, cmd, env):
+        raise FileNotFoundError("uvx")
+
+    watcher._run = run
+    watcher._update({folder})
+    assert "a.py" in find_sections(watcher.get_output_file(folder).read_text(), ["a.py"])
@@ -0,0 +1,33 @@
+"""Tests for the web UI's JSON API"""
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("md_mcp.chunking")
+
+from docs_mcp.web import app as web  # noqa: E402
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "a.md").write_text("# A\n\nalpha beta\n\n## B\n\nbeta gamma\n", encoding='utf-8')
+    monkeypatch.setattr(web.state, 'kb_path', str(kb))
+    monkeypatch.setattr(web.state, '_search_cache', {})
+    return web.app.test_client()
+
+
+def test_search_batch(client):
+    response = client.post('/api/search/batch', json={'queries': ['alpha', 'gamma'], 'top_k': 1})
+    data = response.get_json()
+    assert data['success']
+    assert [len(r['results']) for r in data['results']] == [1, 1]
+    assert data['results'][0]['results'][0]['kb_files'] == ['a.md']
+    assert data['results'][0]['results'][0]['sources'] == []
+
+
+@pytest.mark.parametrize('top_k', [0, -1, 'x', True, 1.5])
+def test_search_batch_rejects_bad_top_k(client, top_k):
+    response = client.post('/api/search/batch', json={'queries': ['alpha'], 'top_k': top_k})
+    assert response.status_code == 400